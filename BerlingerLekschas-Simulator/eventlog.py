@@ -0,0 +1,236 @@
+import numpy as np
+import threading
+
+from events import (
+    HopCount, Homing, InfoExternal, InfoInternal, LeaderElection, Move, Ping,
+    StartHopCount, StartLeaderElection
+)
+from eventcodes import (
+    INFO_EXTERNAL, INFO_INTERNAL, PING, HOMING, HOP_COUNT, START_HOP_COUNT,
+    MOVE, LEADER_ELECTION, START_LEADER_ELECTION
+)
+
+# One packed record per transmitted event. Fields an event does not have keep
+# their default. Messages are stored as indices into a message table.
+EVENT_DTYPE = np.dtype([
+    ('tick', 'i8'),
+    ('opcode', 'u1'),
+    ('source_id', 'i4'),
+    ('clock', 'i8'),
+    ('hops', 'i4'),
+    ('max_id', 'i4'),
+    ('message', 'i4'),
+    ('track', '?'),
+    ('x', 'f8'),
+    ('y', 'f8')
+])
+PING_CODE = ord(PING)
+
+
+def decode(record, messages):
+    """Recreate the event object of a record
+
+    Arguments:
+        record {np.void} -- Record of `EVENT_DTYPE`
+        messages {list} -- Message table of the log the record belongs to
+
+    Returns:
+        * -- Event instance
+    """
+    opcode = bytes([record['opcode']])
+    source_id = int(record['source_id'])
+    message = messages[record['message']] if record['message'] >= 0 else None
+
+    if opcode == PING:
+        return Ping(source_id)
+    if opcode == HOMING:
+        return Homing()
+    if opcode == MOVE:
+        return Move(float(record['x']), float(record['y']))
+    if opcode == HOP_COUNT:
+        return HopCount(source_id, int(record['clock']), int(record['hops']))
+    if opcode == START_HOP_COUNT:
+        return StartHopCount()
+    if opcode == LEADER_ELECTION:
+        return LeaderElection(source_id, int(record['max_id']))
+    if opcode == START_LEADER_ELECTION:
+        return StartLeaderElection()
+    if opcode == INFO_INTERNAL:
+        return InfoInternal(
+            source_id, int(record['clock']), message, int(record['hops'])
+        )
+    if opcode == INFO_EXTERNAL:
+        return InfoExternal(message, bool(record['track']))
+
+    raise ValueError('Unknown opcode {}'.format(opcode))
+
+
+class EventLog():
+    """Compact log of transmitted events
+
+    Every event is packed into one record of `EVENT_DTYPE`, so the channel can
+    hand over all traffic without keeping any event objects alive. Records are
+    buffered as plain tuples and converted into one NumPy array when the
+    observer reads the records of a tick. Optionally all records are kept to
+    save the traffic of a whole run to disk and replay it later.
+    """
+
+    def __init__(self, keep=False):
+        """Create an empty log
+
+        Keyword Arguments:
+            keep {bool} -- If `true` keep all records after they were read,
+                e.g., to save them (default: {False})
+        """
+        self.keep = keep
+        self.pending = []
+        self.chunks = []
+        self.messages = []
+        self.message_ids = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return sum(chunk.size for chunk in self.chunks) + len(self.pending)
+
+    def message_id(self, message):
+        """Index of a message in the message table
+
+        Adds the message to the table if it is new. The caller has to hold
+        `self.lock`.
+
+        Arguments:
+            message {*} -- Some information, e.g., a number or a string
+
+        Returns:
+            int -- Index into the message table, -1 for no message
+        """
+        if message is None:
+            return -1
+
+        try:
+            key = (type(message), message)
+            hash(key)
+        except TypeError:
+            # Unhashable messages are not deduplicated
+            self.messages.append(message)
+            return len(self.messages) - 1
+
+        if key not in self.message_ids:
+            self.message_ids[key] = len(self.messages)
+            self.messages.append(message)
+
+        return self.message_ids[key]
+
+    def append(self, event, tick=-1):
+        """Pack an event into a new record
+
+        Arguments:
+            event {*} -- Event instance
+
+        Keyword Arguments:
+            tick {int} -- Clock of the sender at transmission (default: {-1})
+        """
+        if event.opcode == PING:
+            # Fast path for the bulk of all traffic
+            with self.lock:
+                self.pending.append(
+                    (tick, PING_CODE, event.source_id, -1, 0, -1, -1, False, 0, 0)
+                )
+            return
+
+        message = getattr(event, 'message', None)
+
+        # Fish threads transmit concurrently, so the message table is only
+        # touched under the lock
+        with self.lock:
+            self.pending.append((
+                tick,
+                ord(event.opcode),
+                getattr(event, 'source_id', -1),
+                getattr(event, 'clock', -1),
+                getattr(event, 'hops', 0),
+                getattr(event, 'max_id', -1),
+                self.message_id(message),
+                getattr(event, 'track', False),
+                getattr(event, 'x', 0),
+                getattr(event, 'y', 0)
+            ))
+
+    def read(self):
+        """Read all records appended since the last read
+
+        Returns:
+            np.array -- Records of `EVENT_DTYPE` in order of transmission
+        """
+        with self.lock:
+            pending = self.pending
+            self.pending = []
+
+        records = np.array(pending, dtype=EVENT_DTYPE)
+        if self.keep:
+            self.chunks.append(records)
+
+        return records
+
+    def empty(self):
+        """Check whether there are unread records
+
+        Returns:
+            bool -- `True` if all records were read
+        """
+        return not self.pending
+
+    def all(self):
+        """All kept records, including unread ones
+
+        Returns:
+            np.array -- Records of `EVENT_DTYPE`
+        """
+        with self.lock:
+            pending = np.array(self.pending, dtype=EVENT_DTYPE)
+
+        return np.concatenate(self.chunks + [pending])
+
+    def save(self, file):
+        """Save all kept records and the message table
+
+        Arguments:
+            file {str} -- Path of the `.npz` file
+        """
+        # Fill the message table one by one, as `np.array()` would turn
+        # messages of equal length, e.g., tuples, into extra dimensions
+        with self.lock:
+            messages = np.empty(len(self.messages), dtype=object)
+            for i, message in enumerate(self.messages):
+                messages[i] = message
+
+        np.savez(file, records=self.all(), messages=messages)
+
+    @classmethod
+    def load(cls, file):
+        """Load a saved log
+
+        Arguments:
+            file {str} -- Path of the `.npz` file
+
+        Returns:
+            EventLog -- Log with all saved records kept
+        """
+        data = np.load(file, allow_pickle=True)
+
+        log = cls(keep=True)
+        log.chunks.append(data['records'])
+        with log.lock:
+            for message in data['messages']:
+                log.message_id(message)
+
+        return log
+
+    def replay(self):
+        """Recreate all kept events in order of transmission
+
+        Yields:
+            tuple -- Tick and event instance
+        """
+        for record in self.all():
+            yield int(record['tick']), decode(record, self.messages)
@@ -8,6 +8,8 @@ class Ping():
     """Ping your beloved neighbor fish
     """
 
+    __slots__ = ('opcode', 'source_id')
+
     def __init__(self, id):
         """Create a ping event to "sense" other fish
 
@@ -23,6 +25,8 @@ class Homing():
     """Homing towards an external source
     """
 
+    __slots__ = ('opcode',)
+
     def __init__(self):
         """Create new homing event.
 
@@ -38,6 +42,8 @@ class Move():
     """Make the fish move to a target direction
     """
 
+    __slots__ = ('opcode', 'x', 'y')
+
     def __init__(self, x=0, y=0):
         """External event to make fish start moving into a target direction
 
@@ -60,6 +66,8 @@ class HopCount():
     a whole glass of juicy beer in just a single hop! Highly efficient!
     """
 
+    __slots__ = ('opcode', 'source_id', 'clock', 'hops')
+
     def __init__(self, id, clock, hops=0):
         """Create an internal information event
 
@@ -83,6 +91,8 @@ class StartHopCount():
     """Initialize a hop count.
     """
 
+    __slots__ = ('opcode',)
+
     def __init__(self):
         """External event to make fish start a hop count
         """
@@ -94,6 +104,8 @@ class LeaderElection():
     """Broadcast a leader election
     """
 
+    __slots__ = ('opcode', 'source_id', 'max_id')
+
     def __init__(self, id, max_id):
         """Create an internal leader lection event
 
@@ -111,6 +123,8 @@ class StartLeaderElection():
     """Initialize a leader election
     """
 
+    __slots__ = ('opcode',)
+
     def __init__(self):
         """External event to make fish start a leader election
         """
@@ -122,6 +136,8 @@ class InfoInternal():
     """Share information internally with other fish
     """
 
+    __slots__ = ('opcode', 'source_id', 'clock', 'message', 'hops')
+
     def __init__(self, id, clock, message, hops=0):
         """Create an internal information event
 
@@ -148,6 +164,8 @@ class InfoExternal():
     """Share external information with fish
     """
 
+    __slots__ = ('opcode', 'message', 'track')
+
     def __init__(self, message, track=False):
         """Create an external information event
 
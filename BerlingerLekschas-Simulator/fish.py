@@ -5,6 +5,7 @@ import time
 import datetime
 
 from events import HopCount, Ping, InfoInternal, LeaderElection
+from inbox import Inbox
 from eventcodes import (
     PING, HOMING, HOP_COUNT, INFO_EXTERNAL, INFO_INTERNAL, START_HOP_COUNT,
     START_LEADER_ELECTION, LEADER_ELECTION, MOVE
@@ -33,7 +34,8 @@ class Fish():
         clock_freq=1,
         neighbor_weight=1.0,
         name='Unnamed',
-        verbose=False
+        verbose=False,
+        inbox=False
     ):
         """Create a new fish
 
@@ -56,6 +58,9 @@ class Fish():
                 (default: {1.0})
             name {str} -- Unique name of the fish. (default: {'Unnamed'})
             verbose {bool} -- If `true` log out some stuff (default: {False})
+            inbox {bool} -- If `true` receive messages in a lock-free
+                `Inbox` instead of a `Queue`. Only safe if all fish are
+                stepped from one thread. (default: {False})
         """
 
         self.id = id
@@ -70,7 +75,8 @@ class Fish():
 
         self.clock_speed = 1 / self.clock_freq
         self.clock = 0
-        self.queue = Queue()
+        self.inbox = inbox
+        self.queue = Inbox() if inbox else Queue()
         self.target_pos = np.zeros((2,))
         self.is_started = False
         self.neighbors = set()
@@ -94,6 +100,9 @@ class Fish():
         # Stores messages to be send out at the end of the clock cycle
         self.messages = []
 
+        # Pings never change, so one instance is sent on every clock cycle
+        self.ping = Ping(self.id)
+
         # Logger instance
         # with open('{}_{}.log'.format(self.name, self.id), 'w') as f:
         #     f.truncate()
@@ -131,36 +140,32 @@ class Fish():
             )
 
     def run(self):
-        """Run the process recursively
+        """Run the process
 
-        This method simulates the fish and calls `eval` on every clock tick as
-        long as the fish `is_started`.
+        This method simulates the fish and calls `eval` and `communicate` on
+        every clock tick in a loop as long as the fish `is_started`.
         """
 
-        if not self.is_started:
-            return
-
-        start_time = time.time()
-        self.eval()
-        time_elapsed = time.time() - start_time
+        while self.is_started:
+            start_time = time.time()
+            self.eval()
+            time_elapsed = time.time() - start_time
 
-        sleep_time = (self.clock_speed / 2) - time_elapsed
+            sleep_time = (self.clock_speed / 2) - time_elapsed
 
-        # print(time_elapsed, sleep_time, self.clock_speed / 2)
-        time.sleep(max(0, sleep_time))
-        if sleep_time < 0 and self.verbose:
-            print('Warning frequency too high or computer too slow')
+            # print(time_elapsed, sleep_time, self.clock_speed / 2)
+            time.sleep(max(0, sleep_time))
+            if sleep_time < 0 and self.verbose:
+                print('Warning frequency too high or computer too slow')
 
-        start_time = time.time()
-        self.communicate()
-        time_elapsed = time.time() - start_time
+            start_time = time.time()
+            self.communicate()
+            time_elapsed = time.time() - start_time
 
-        sleep_time = (self.clock_speed / 2) - time_elapsed
-        time.sleep(max(0, sleep_time))
-        if sleep_time < 0 and self.verbose:
-            print('Warning frequency too high or computer too slow')
-
-        self.run()
+            sleep_time = (self.clock_speed / 2) - time_elapsed
+            time.sleep(max(0, sleep_time))
+            if sleep_time < 0 and self.verbose:
+                print('Warning frequency too high or computer too slow')
 
     def move_handler(self, event):
         """Handle move events, i.e., update the target position.
@@ -195,6 +200,31 @@ class Fish():
                 self.id, event.source_id, rel_pos[event.source_id]
             ))
 
+    def ping_handler_all(self, neighbors, rel_pos, source_ids):
+        """Handle many ping events at once
+
+        Same as calling `ping_handler()` for every ping in order.
+
+        Arguments:
+            neighbors {set} -- Set of active neighbors, i.e., nodes from which
+                this fish received a ping event.
+            rel_pos {dict} -- Dictionary of relative positions from this fish
+                to the source of the ping event.
+            source_ids {np.array} -- IDs of the fish that sent the pings
+        """
+        for source_id in source_ids.tolist():
+            neighbors.add(source_id)
+
+            # When the other fish is not perceived its relative position is [0,0]
+            rel_pos[source_id] = self.interaction.perceive_pos(
+                self.id, source_id
+            )
+
+            if self.verbose:
+                print('Fish #{}: saw friend #{} at {}'.format(
+                    self.id, source_id, rel_pos[source_id]
+                ))
+
     def homing_handler(self, event, pos):
         """Homing handler, i.e., make fish aggregated extremely
 
@@ -457,49 +487,85 @@ class Fish():
         elif self.info == 'signal_aircraft':
             self.lim_neighbors = [math.inf, math.inf]
 
-    def eval(self):
-        """The fish evaluates its state
+    def handle(self, neighbors, rel_pos, event, pos):
+        """Dispatch a received event to its handler
 
-        Currently the fish checks all responses to previous pings and evaluates
-        its relative position to all neighbors. Neighbors are other fish that
-        received the ping element.
+        Arguments:
+            neighbors {set} -- Set of active neighbors, i.e., nodes from which
+                this fish received a ping event.
+            rel_pos {dict} -- Dictionary of relative positions from this fish
+                to the source of the ping event.
+            event {*} -- The received event instance
+            pos {np.array} -- Position attached to the event
         """
+        if event.opcode == PING:
+            self.ping_handler(neighbors, rel_pos, event)
 
-        # Set of neighbors at this point. Will be reconstructed every time
-        neighbors = set()
-        rel_pos = {}
+        if event.opcode == HOMING:
+            self.homing_handler(event, pos)
 
-        self.saw_hop_count = False
+        if event.opcode == START_HOP_COUNT:
+            self.start_hop_count_handler(event)
 
-        while not self.queue.empty():
-            (event, pos) = self.queue.get()
+        if event.opcode == HOP_COUNT:
+            self.hop_count_handler(event)
 
-            if event.opcode == PING:
-                self.ping_handler(neighbors, rel_pos, event)
+        if event.opcode == INFO_EXTERNAL:
+            self.info_ext_handler(event)
 
-            if event.opcode == HOMING:
-                self.homing_handler(event, pos)
+        if event.opcode == INFO_INTERNAL:
+            self.info_int_handler(event)
 
-            if event.opcode == START_HOP_COUNT:
-                self.start_hop_count_handler(event)
+        if event.opcode == START_LEADER_ELECTION:
+            self.start_leader_election_handler(event)
 
-            if event.opcode == HOP_COUNT:
-                self.hop_count_handler(event)
+        if event.opcode == LEADER_ELECTION:
+            self.leader_election_handler(event)
 
-            if event.opcode == INFO_EXTERNAL:
-                self.info_ext_handler(event)
+        if event.opcode == MOVE:
+            self.move_handler(event)
 
-            if event.opcode == INFO_INTERNAL:
-                self.info_int_handler(event)
+    def read_inbox(self, neighbors, rel_pos):
+        """Handle all messages in the inbox at once
+
+        Pings, the bulk of all traffic, are selected by opcode and handled in
+        one batch. All other events are dispatched one by one in order of
+        arrival.
+
+        Arguments:
+            neighbors {set} -- Set of active neighbors, i.e., nodes from which
+                this fish received a ping event.
+            rel_pos {dict} -- Dictionary of relative positions from this fish
+                to the source of the ping event.
+        """
+        source_ids, opcodes, events, positions = self.queue.read()
 
-            if event.opcode == START_LEADER_ELECTION:
-                self.start_leader_election_handler(event)
+        is_ping = opcodes == ord(PING)
+        self.ping_handler_all(neighbors, rel_pos, source_ids[is_ping])
 
-            if event.opcode == LEADER_ELECTION:
-                self.leader_election_handler(event)
+        for i in np.flatnonzero(~is_ping):
+            self.handle(neighbors, rel_pos, events[i], positions[i])
 
-            if event.opcode == MOVE:
-                self.move_handler(event)
+    def eval(self):
+        """The fish evaluates its state
+
+        Currently the fish checks all responses to previous pings and evaluates
+        its relative position to all neighbors. Neighbors are other fish that
+        received the ping element.
+        """
+
+        # Set of neighbors at this point. Will be reconstructed every time
+        neighbors = set()
+        rel_pos = {}
+
+        self.saw_hop_count = False
+
+        if self.inbox:
+            self.read_inbox(neighbors, rel_pos)
+        else:
+            while not self.queue.empty():
+                (event, pos) = self.queue.get()
+                self.handle(neighbors, rel_pos, event, pos)
 
         if self.clock > 1:
             # Move around (or just stay where you are)
@@ -524,4 +590,4 @@ class Fish():
         self.messages = []
 
         # Always send out a ping to other fish
-        self.channel.transmit(self, Ping(self.id))
+        self.channel.transmit(self, self.ping)
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class Inbox():
+    """Lock-free inbox of a fish for single-threaded simulations
+
+    Drop-in replacement for the `queue.Queue` of a fish when all fish are
+    stepped from one thread, e.g., by `run_lockstep_simulation()`. Messages are
+    appended to plain lists without any locking and read all at once as
+    per-tick arrays of source IDs and one-byte opcodes along with the events
+    and positions, so handlers can process messages of the same kind in batch.
+    """
+
+    def __init__(self):
+        """Create an empty inbox
+        """
+        self.source_ids = []
+        self.opcodes = bytearray()
+        self.events = []
+        self.positions = []
+
+    def put(self, message):
+        """Add a message
+
+        Same signature as `queue.Queue.put()`.
+
+        Arguments:
+            message {tuple} -- Event and position, i.e., `(event, pos)`
+        """
+        event, pos = message
+
+        self.source_ids.append(getattr(event, 'source_id', -1))
+        self.opcodes += event.opcode
+        self.events.append(event)
+        self.positions.append(pos)
+
+    def empty(self):
+        """Check whether there are no messages
+
+        Returns:
+            bool -- `True` if the inbox is empty
+        """
+        return not self.events
+
+    def read(self):
+        """Read and remove all messages
+
+        Returns:
+            tuple -- Source IDs (-1 for events without source) and opcodes as
+                arrays, and events and positions as lists, all in order of
+                arrival
+        """
+        source_ids = np.array(self.source_ids, dtype=int)
+        opcodes = np.frombuffer(bytes(self.opcodes), dtype=np.uint8)
+        events = self.events
+        positions = self.positions
+
+        self.source_ids = []
+        self.opcodes = bytearray()
+        self.events = []
+        self.positions = []
+
+        return source_ids, opcodes, events, positions
@@ -1,5 +1,5 @@
 import numpy as np
-from queue import Queue, PriorityQueue
+from queue import PriorityQueue
 import time
 import matplotlib.patches as mpatches
 import matplotlib.pyplot as plt
@@ -8,6 +8,9 @@ from eventcodes import (
     INFO_EXTERNAL, INFO_INTERNAL, START_HOP_COUNT, HOP_COUNT,
     START_LEADER_ELECTION, LEADER_ELECTION
 )
+from eventlog import EventLog
+from recorder import Recorder
+from store import TrajectoryStore
 
 # 21 categorical colors. Used for plotting
 colors = [
@@ -45,7 +48,12 @@ class Observer():
         channel,
         clock_freq=1,
         fish_pos=None,
-        verbose=False
+        verbose=False,
+        log_traffic=False,
+        max_history=None,
+        store=None,
+        record=None,
+        record_fish=None
     ):
         """Create a god-like observer!
 
@@ -61,6 +69,22 @@ class Observer():
                 fish (default: {1})
             fish_pos {np.array} -- Initial fish positions (default: {None})
             verbose {bool} -- If `true` log out some stuff (default: {False})
+            log_traffic {bool} -- If `true` keep every intercepted
+                transmission in `self.transmissions`, which can be saved with
+                `self.transmissions.save()` (default: {False})
+            max_history {int} -- Keep only the most recent samples of every
+                recorded series, so memory stays bounded however long the
+                simulation runs. Keep all samples if None.
+                (default: {None})
+            store {str} -- Directory to stream all recorded series to. The
+                series can be loaded lazily with `TrajectoryStore.open()`
+                even for runs that do not fit into memory. (default: {None})
+            record {dict} -- Fields to record, 'pos', 'status', or 'messages',
+                mapped to the number of ticks between two samples, e.g.,
+                `{'messages': 1}` for a hop count study. Record all fields
+                at every tick if None. (default: {None})
+            record_fish {list} -- Ids of the fish whose positions and status
+                are recorded. Record all fish if None. (default: {None})
         """
         self.environment = environment
         self.fish = fish
@@ -73,26 +97,44 @@ class Observer():
         self.clock = 0
 
         self.num_nodes = self.environment.node_pos.shape[0]
-        self.x = []
-        self.y = []
         self.c = []
-        self.status = []
         self.reset = False
 
+        self.record_fish = None
+        num_recorded = self.num_nodes
+        if record_fish is not None:
+            self.record_fish = np.array(record_fish, dtype=int)
+            num_recorded = self.record_fish.size
+
+        # Positions and connectivity status of the recorded fish and the
+        # number of intercepted messages, one slice per tick
+        if store is not None:
+            store = TrajectoryStore(
+                store,
+                num_nodes=self.num_nodes,
+                clock_freq=clock_freq,
+                node_ids=self.record_fish
+            )
+        self.recorder = Recorder(
+            max_history=max_history, store=store, spec=record
+        )
+        self.recorder.add('pos', (num_recorded, 2))
+        self.recorder.add('status', (num_recorded,), dtype=np.int8)
+        self.recorder.add('messages', dtype=int)
+        self.recorder.check_spec()
+        self.num_messages = 0
+
         self.node_colors = []
         for i in range(self.num_nodes):
             ii = i % 20
             self.node_colors.append(colors[ii])
-            self.x.append([])
-            self.y.append([])
-            self.status.append([])
 
         self.is_started = False
 
         self.track_info = None
         self.not_saw_info = 0
 
-        self.transmissions = Queue()
+        self.transmissions = EventLog(keep=log_traffic)
         self.instructions = PriorityQueue()
 
         self.study_info_consistency = False
@@ -149,6 +191,63 @@ class Observer():
         if fish_id is not None:
             self.object = self.environment.node_pos[fish_id]
 
+    def per_fish(self, samples):
+        """Arrange recorded samples by fish
+
+        Arguments:
+            samples {np.array} -- Samples of shape (T, n, ...) of the
+                recorded fish
+
+        Returns:
+            np.array -- Array of shape (N, T, ...), a view if all fish are
+                recorded. Rows of fish that are not recorded are NaN.
+        """
+        samples = np.moveaxis(samples, 1, 0)
+        if self.record_fish is None:
+            return samples
+
+        series = np.full((self.num_nodes,) + samples.shape[1:], np.nan)
+        series[self.record_fish] = samples
+
+        return series
+
+    @property
+    def x(self):
+        """Recorded x positions
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('pos')[:, :, 0])
+
+    @property
+    def y(self):
+        """Recorded y positions
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('pos')[:, :, 1])
+
+    @property
+    def status(self):
+        """Recorded connectivity status, -1 for too few, 0 for enough, and 1
+        for too many neighbors
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('status'))
+
+    @property
+    def messages(self):
+        """Recorded number of intercepted messages per tick
+
+        Returns:
+            np.array -- View of shape (T,)
+        """
+        return self.recorder.get('messages')
+
     def start(self):
         """Start the process
 
@@ -163,6 +262,7 @@ class Observer():
         This sets `is_started` to false.
         """
         self.is_started = False
+        self.recorder.flush()
 
         if self.track_hop_count:
             self.study_data[0].append(self.track_hop_count_num_events)
@@ -179,26 +279,22 @@ class Observer():
             )
 
     def run(self):
-        """Run the process recursively
+        """Run the process
 
-        This method simulates the fish and calls `eval` on every clock tick as
-        long as the fish `is_started`.
+        This method calls `eval` on every clock tick in a loop as long as the
+        observer `is_started`. Alternatively, leave the observer stopped and
+        let `step_simulation()` call `eval` once per tick.
         """
+        while self.is_started:
+            time.sleep(self.clock_speed / 2)
 
-        if not self.is_started:
-            return
-
-        time.sleep(self.clock_speed / 2)
+            start_time = time.time()
 
-        start_time = time.time()
+            self.eval()
 
-        self.eval()
-
-        time_elapsed = time.time() - start_time
-        sleep_time = (self.clock_speed / 2) - time_elapsed
-        time.sleep(max(0, sleep_time))
-
-        self.run()
+            time_elapsed = time.time() - start_time
+            sleep_time = (self.clock_speed / 2) - time_elapsed
+            time.sleep(max(0, sleep_time))
 
     def activate_reset(self):
         """Activate automatic resetting of the fish positions on a new
@@ -232,6 +328,7 @@ class Observer():
 
             if self.reset and self.fish_pos is not None:
                 self.environment.node_pos = np.copy(self.fish_pos)
+                self.environment.update_distance()
 
             _, event, fish_id, pos, fish_all = self.instructions.get()
             if fish_id is not None:
@@ -320,23 +417,25 @@ class Observer():
         """Check intercepted transmission from the channel
         """
 
-        not_saw_info = True
-
-        while not self.transmissions.empty():
-            event = self.transmissions.get()
+        records = self.transmissions.read()
+        opcodes = records['opcode']
+        self.num_messages = records.size
 
-            if event.opcode == INFO_INTERNAL:
-                not_saw_info = False
+        not_saw_info = not np.any(opcodes == ord(INFO_INTERNAL))
 
-            if event.opcode == HOP_COUNT:
-                if self.track_hop_count_started:
-                    self.hop_count_source_id = event.source_id
-                    self.track_hop_count_started = False
+        hop_counts = np.flatnonzero(opcodes == ord(HOP_COUNT))
+        if hop_counts.size > 0:
+            if self.track_hop_count_started:
+                self.hop_count_source_id = int(
+                    records['source_id'][hop_counts[0]]
+                )
+                self.track_hop_count_started = False
 
-                self.track_hop_count_num_events += 1
+            self.track_hop_count_num_events += hop_counts.size
 
-            if event.opcode == LEADER_ELECTION:
-                self.track_leader_election_num_events += 1
+        self.track_leader_election_num_events += int(
+            np.sum(opcodes == ord(LEADER_ELECTION))
+        )
 
         if not_saw_info:
             self.not_saw_info += 1
@@ -351,23 +450,35 @@ class Observer():
 
     def eval(self):
         """Save the position and connectivity status of the fish.
+
+        First commits the moves of the last clock tick to the environment, so
+        deferred distances are updated once per tick in the threaded as well
+        as the lock-step simulation.
         """
+        self.environment.commit_moves()
 
         self.check_transmissions()
         self.check_instructions()
 
-        for i in range(self.num_nodes):
-            self.x[i].append(self.environment.node_pos[i, 0])
-            self.y[i].append(self.environment.node_pos[i, 1])
+        fish_ids = slice(None) if self.record_fish is None else self.record_fish
 
-            n = len(self.fish[i].neighbors)
+        if self.recorder.records('pos', self.clock):
+            self.recorder.append(
+                'pos', self.environment.node_pos[fish_ids, :2]
+            )
 
-            if n < self.fish[i].lim_neighbors[0]:
-                self.status[i].append(-1)
-            elif n > self.fish[i].lim_neighbors[1]:
-                self.status[i].append(1)
-            else:
-                self.status[i].append(0)
+        if self.recorder.records('status', self.clock):
+            fish = self.fish
+            if self.record_fish is not None:
+                fish = [self.fish[i] for i in self.record_fish]
+            n = np.array([len(f.neighbors) for f in fish])
+            lim = np.array([f.lim_neighbors for f in fish])
+            self.recorder.append(
+                'status', (n > lim[:, 1]).astype(np.int8) - (n < lim[:, 0])
+            )
+
+        if self.recorder.records('messages', self.clock):
+            self.recorder.append('messages', self.num_messages)
 
         self.clock += 1
 
@@ -394,32 +505,41 @@ class Observer():
                 alpha=0.5
             )
 
+        x, y, status = self.x, self.y, self.status
+        if status.shape[1] != x.shape[1]:
+            # Status markers need a status sample for every position
+            status = np.zeros((self.num_nodes, 0))
+
         for i in range(self.num_nodes):
+            if not np.isfinite(x[i]).any():
+                # Fish was not recorded
+                continue
+
             c = self.node_colors[i]
             if i != 0 and not i % 20 and dark:
                 c = [1.0, 1.0, 1.0, 1.0]
 
             plt.plot(
-                self.x[i],
-                self.y[i],
+                x[i],
+                y[i],
                 c=c,
                 linewidth=4.0,
                 alpha=0.66
             )
 
-            if len(self.status[i]) < 100:
-                for j in range(1, len(self.status[i])-1):
+            if len(status[i]) < 100:
+                for j in range(1, len(status[i])-1):
                     face = c
                     edge = c
-                    if self.status[i][j] == 0:
+                    if status[i][j] == 0:
                         marker = 'None'
                     else:
                         marker = 'o'
-                        face = 'black' if self.status[i][j] == -1 else c
+                        face = 'black' if status[i][j] == -1 else c
 
                     plt.scatter(
-                        self.x[i][j],
-                        self.y[i][j],
+                        x[i][j],
+                        y[i][j],
                         marker=marker,
                         facecolors=face,
                         edgecolors=edge,
@@ -428,16 +548,16 @@ class Observer():
                     )
 
             plt.scatter(
-                self.x[i][0],
-                self.y[i][0],
+                x[i][0],
+                y[i][0],
                 c=c,
                 marker='>',
                 s=200,
                 alpha=1
             )
             plt.scatter(
-                self.x[i][-1],
-                self.y[i][-1],
+                x[i][-1],
+                y[i][-1],
                 c=c,
                 marker='s',
                 s=50,
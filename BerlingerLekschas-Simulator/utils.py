@@ -62,7 +62,8 @@ def generate_fish(
     fish_max_speeds=None,
     clock_freqs=None,
     verbose=False,
-    names=None
+    names=None,
+    inbox=False
 ):
     """Generate some fish
 
@@ -75,6 +76,8 @@ def generate_fish(
         fish_max_speeds {float|list} -- List of max speeds
         clock_freqs {int|list} -- List of clock speeds
         names {list} -- List of names for your fish
+        inbox {bool} -- Give every fish a lock-free `Inbox` instead of a
+            `Queue`, for `run_lockstep_simulation()` only
     """
 
     if neighbor_weights is None:
@@ -106,7 +109,8 @@ def generate_fish(
             fish_max_speed=fish_max_speeds[i],
             clock_freq=clock_freqs[i],
             verbose=verbose,
-            name=names[i]
+            name=names[i],
+            inbox=inbox
         ))
 
     return fish
@@ -253,3 +257,62 @@ def run_simulation(
 
     # Ciao stops run time
     threading.Timer(run_time, stop).start()
+
+
+def step_simulation(fish, observer):
+    """Advance all fish and the observer by exactly one clock tick.
+
+    Every fish first evaluates its queue and moves, then the observer records
+    the swarm and broadcasts due instructions, and finally every fish
+    communicates. This is the same order the threaded simulation aims for but
+    without any sleeping.
+
+    Arguments:
+        fish {list} -- List of fish instances
+        observer {Observer} -- Observer instance
+    """
+    for f in fish:
+        f.eval()
+
+    observer.eval()
+
+    for f in fish:
+        f.communicate()
+
+
+def run_lockstep_simulation(
+    fish,
+    observer,
+    num_ticks=10,
+    dark=False,
+    white_axis=False,
+    no_legend=False,
+    no_star=False
+):
+    """Run the simulation synchronously for a fixed number of clock ticks.
+
+    Unlike `run_simulation()` no threads are started and nothing sleeps, so the
+    simulation runs as fast as the CPU allows and always covers exactly
+    `num_ticks` clock cycles.
+
+    Arguments:
+        fish {list} -- List of fish instances
+        observer {Observer} -- Observer instance
+
+    Keyword Arguments:
+        num_ticks {int} -- Total number of clock ticks (default: {10})
+        dark {bool} -- If `True` plot a dark chart (default: {False})
+        white_axis {bool} -- If `True` plot white axes (default: {False})
+        no_legend {bool} -- If `True` do not plot a legend (default: {False})
+        no_star {bool} -- If `True` do not plot a star (default: {False})
+    """
+    for _ in range(num_ticks):
+        step_simulation(fish, observer)
+
+    observer.stop()
+    observer.plot(
+        dark=dark,
+        white_axis=white_axis,
+        no_legend=no_legend,
+        no_star=no_star
+    )
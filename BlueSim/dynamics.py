@@ -1,27 +1,53 @@
-"""Helper class to simulate the dynamics of BlueBot. Simulation step should be set according to swarm size. Large numbers of robots require larger steps. This can be automated in the future.
+"""Helper class to simulate the dynamics of BlueBot. Simulation step should be set according to swarm size. Large numbers of robots require larger steps. Semi-implicit Euler stays stable and is more accurate than explicit Euler at the same step, RK4 is more accurate still, and RK45 adapts the step to an error tolerance, see integrator_benchmark.py.
 """
 from math import *
 import numpy as np
 
+# Dormand-Prince 5(4) coefficients for the adaptive RK45 integrator
+DP_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]
+]
+DP_B = [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84]
+DP_E = [71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40] # 5th minus 4th order weights
+
+INTEGRATORS = ('euler', 'semi_implicit', 'rk4', 'rk45')
+
 
 class Dynamics():
 
-    """Simulates the dynamics of BlueBot with Euler integration according to its equations of motion.
+    """Simulates the dynamics of BlueBot according to its equations of motion. Integrates with explicit Euler by default, or with semi-implicit Euler, RK4, or adaptive RK45.
 
     """
 
-    def __init__(self, environment, clock_freq=1):
+    def __init__(self, environment, clock_freq=1, integrator='euler', deltat=0.1, tol=1e-6, h_min=1e-8):
         """Constructor
 
         Args:
             environment (class): For global positions
             clock_freq (int, optional): For integration time
+            integrator (str, optional): 'euler', 'semi_implicit', 'rk4', or 'rk45'
+            deltat (float, optional): Integration step, [s], initial step for 'rk45'. The last step of a clock tick is shortened if deltat does not divide it.
+            tol (float, optional): Error tolerance per step for 'rk45'
+            h_min (float, optional): Smallest step of 'rk45', [s]. Integration fails if the error control needs a smaller one.
         """
+        if integrator not in INTEGRATORS:
+            raise ValueError('Unknown integrator "{}", choose one of {}'.format(integrator, INTEGRATORS))
+
         self.environment = environment
+        self.integrator = integrator
+        self.tol = tol
+        self.h_min = h_min
 
         # Simulation Step and Time
-        self.deltat = 0.1 # [s]
+        self.deltat = deltat # [s]
         self.t_simu = 1 / clock_freq # [s]
+        self.h_adaptive = min(deltat, self.t_simu) # [s], current step of 'rk45'
+        self.num_steps = 0 # accepted integration steps, for benchmarking
 
         # Robot Specs
         self.rho = 998 # [kg/m^3], water density
@@ -44,30 +70,37 @@ class Dynamics():
         self.F_buoy = 0.010 # [N]
         self.vx_max = 0.160 # [m/s]
 
-        # Initialize Control
-        self.F_caud = 0 # [N]
-        self.F_PR = 0 # [N]
-        self.F_PL = 0 # [N]
-        self.F_dors = 0 # [N]
+        # Initialize Control, one entry per robot
+        num_robots = self.environment.node_pos.shape[0]
+        self.F_caud = np.zeros((num_robots,)) # [N]
+        self.F_PR = np.zeros((num_robots,)) # [N]
+        self.F_PL = np.zeros((num_robots,)) # [N]
+        self.F_dors = np.zeros((num_robots,)) # [N]
 
-    def update_ctrl(self, dorsal, caudal, pect_r, pect_l):
+    def update_ctrl(self, dorsal, caudal, pect_r, pect_l, source_id=None):
         """Update BlueBots fin control. Those thrust forces are then used in the equations of motion.
 
+        Every robot has its own thrust forces, so all robots can set their controls first and are then integrated in one batch with simulate_moves().
+
         Args:
             dorsal (float): Dorsal gain
             caudal (float): Caudal gain
             pect_r (float): Pectoral right gain
             pect_l (float): Pectoral left gain
+            source_id (int, optional): Fish ID, or None to update all robots with scalar gains or (N,) arrays of gains
         """
         F_caud_max = 0.020 # [N]
         F_PR_max = 0.006 # [N]
         F_PL_max = 0.006 # [N]
         F_dors_max = 0.020 # [N]
 
-        self.F_caud = caudal * F_caud_max
-        self.F_PR = pect_r * F_PR_max
-        self.F_PL = pect_l * F_PL_max
-        self.F_dors = dorsal * F_dors_max
+        if source_id is None:
+            source_id = slice(None)
+
+        self.F_caud[source_id] = caudal * F_caud_max
+        self.F_PR[source_id] = pect_r * F_PR_max
+        self.F_PL[source_id] = pect_l * F_PL_max
+        self.F_dors[source_id] = dorsal * F_dors_max
 
     def simulate_move(self, source_id):
         """Simulates move starting from current global coordinates based on current velocities and fin control. Returns next global coordinates.
@@ -78,55 +111,251 @@ class Dynamics():
         Returns:
             np.array: 3D global next position
         """
+        return self.simulate_moves([source_id])[0]
+
+    def simulate_moves(self, source_ids=None):
+        """Simulates moves of several robots at once based on their own fin controls. All robots are integrated together with (N,) arrays per integration step.
+
+        Args:
+            source_ids (list, optional): Fish IDs, all fish if None
+
+        Returns:
+            np.array: (N, 3) global next positions
+        """
         mm_to_m = 1/1000
         m_to_mm = 1000
 
-        g_P_r = np.zeros((3,))
-        g_Pdot_r = mm_to_m * self.environment.node_vel[source_id]
-        phi = self.environment.node_phi[source_id]
-        vphi = self.environment.node_vphi[source_id]
-
-        r_T_g = np.array([[cos(phi), sin(phi), 0], [-sin(phi), cos(phi), 0], [0, 0, 1]])
-        r_Pdot_r = r_T_g @ g_Pdot_r
-        vx = r_Pdot_r[0]
-        vy = r_Pdot_r[1]
-        vz = r_Pdot_r[2]
-
-        for t in range(int(self.t_simu*1/self.deltat)):
-            # Equations of Motion
-            x_dot = vx
-            y_dot = vy
-            z_dot = vz
-            phi_dot = vphi
-
-            self.C_dphi = self.C_dphi_static + self.C_dphi_static * 9 * abs(x_dot) / self.vx_max
-            self.C_dy = self.C_dy_static + self.C_dy_static * 4 * abs(x_dot) / self.vx_max
-            if x_dot > 0:
-                self.C_dx = self.C_dx_fwd
-            else:
-                self.C_dx = self.C_dx_bwd
+        if source_ids is None:
+            source_ids = np.arange(self.environment.node_pos.shape[0])
+        source_ids = np.asarray(source_ids)
+        n = source_ids.size
+
+        g_Pdot_r = mm_to_m * self.environment.node_vel[source_ids]
+        phi = np.reshape(self.environment.node_phi[source_ids], (n,)).astype(float)
+        vphi = np.reshape(self.environment.node_vphi[source_ids], (n,)).astype(float)
+
+        cos_phi = np.cos(phi)
+        sin_phi = np.sin(phi)
+        vx = cos_phi * g_Pdot_r[:, 0] + sin_phi * g_Pdot_r[:, 1]
+        vy = -sin_phi * g_Pdot_r[:, 0] + cos_phi * g_Pdot_r[:, 1]
+        vz = g_Pdot_r[:, 2]
+
+        F_caud = self.F_caud[source_ids]
+        F_PR = self.F_PR[source_ids]
+        F_PL = self.F_PL[source_ids]
+        F_dors = self.F_dors[source_ids]
 
-            vx_dot = 1/self.m_robot * (self.F_caud - sin(self.pect_angle)*self.F_PL - sin(self.pect_angle)*self.F_PR - 1/2*self.rho*self.C_dx*self.A_x*np.sign(x_dot)*x_dot**2)
-            vy_dot = 1/self.m_robot * (cos(self.pect_angle)*self.F_PL - cos(self.pect_angle)*self.F_PR - 1/2*self.rho*self.C_dy*self.A_y*np.sign(y_dot)*y_dot**2)
-            vz_dot = 1/self.m_robot * (self.F_dors - self.F_buoy - 1/2*self.rho*self.C_dz*self.A_z*np.sign(z_dot)*z_dot**2)
-            vphi_dot = 1/self.I_robot * (self.pect_dist*cos(self.pect_angle)*self.F_PL - self.pect_dist*cos(self.pect_angle)*self.F_PR - 1/2*self.rho*self.C_dphi*self.A_phi*np.sign(phi_dot)*(self.l_robot/6*phi_dot)**2)
+        # Thrust does not change during the integration
+        F_x = F_caud - sin(self.pect_angle)*F_PL - sin(self.pect_angle)*F_PR
+        F_y = cos(self.pect_angle)*F_PL - cos(self.pect_angle)*F_PR
+        F_z = F_dors - self.F_buoy
+        M_phi = self.pect_dist*cos(self.pect_angle)*F_PL - self.pect_dist*cos(self.pect_angle)*F_PR
+        thrust = (F_x, F_y, F_z, M_phi)
 
-            # Euler Integration
-            vx = x_dot + self.deltat*vx_dot
-            vy = y_dot + self.deltat*vy_dot
-            vz = z_dot + self.deltat*vz_dot
+        # State: robot frame velocities, orientation, angular velocity, and global displacement
+        state = np.array([vx, vy, vz, phi, vphi, np.zeros(n), np.zeros(n), np.zeros(n)])
 
-            phi = phi + self.deltat*phi_dot
-            vphi = phi_dot + self.deltat*vphi_dot
+        if self.integrator == 'euler':
+            state = self.euler(state, thrust)
+        elif self.integrator == 'semi_implicit':
+            state = self.semi_implicit_euler(state, thrust)
+        elif self.integrator == 'rk4':
+            state = self.rk4(state, thrust)
+        else:
+            state = self.rk45(state, thrust)
 
-            # Robot to Global Transformation
-            g_T_r = np.array([[cos(phi), -sin(phi), 0], [sin(phi), cos(phi), 0], [0, 0, 1]])
-            g_Pdot_r = g_T_r @ np.array([vx, vy, vz])
-            g_P_r = g_P_r + self.deltat*np.transpose(g_Pdot_r)
+        phi = state[3]
+        vphi = state[4]
+        g_P_r = np.transpose(state[5:])
+        g_Pdot_r = np.transpose(self.robot_to_global(state))
 
-        self.environment.node_vel[source_id] = m_to_mm * g_Pdot_r #xx
-        self.environment.node_phi[source_id] = phi
-        self.environment.node_vphi[source_id] = vphi
+        self.environment.node_vel[source_ids] = m_to_mm * g_Pdot_r
+        self.environment.node_phi[source_ids] = np.reshape(phi, np.shape(self.environment.node_phi[source_ids]))
+        self.environment.node_vphi[source_ids] = np.reshape(vphi, np.shape(self.environment.node_vphi[source_ids]))
 
         return m_to_mm * g_P_r
 
+    def step_sizes(self):
+        """Fixed integration steps that cover one clock tick. If deltat does not divide t_simu, the last step is shortened, so no time is dropped.
+
+        Returns:
+            list: Integration steps, [s]
+        """
+        num_steps = max(1, ceil(self.t_simu/self.deltat - 1e-9))
+        h_last = self.t_simu - (num_steps-1)*self.deltat
+        if abs(h_last - self.deltat) < 1e-9:
+            h_last = self.deltat
+
+        return [self.deltat]*(num_steps-1) + [h_last]
+
+    def robot_to_global(self, state):
+        """Rotates robot frame velocities into global coordinates.
+
+        Args:
+            state (np.array): (8, N) robot states, see equations_of_motion()
+
+        Returns:
+            np.array: (3, N) global velocities, [m/s]
+        """
+        cos_phi = np.cos(state[3])
+        sin_phi = np.sin(state[3])
+        return np.array([cos_phi*state[0] - sin_phi*state[1], sin_phi*state[0] + cos_phi*state[1], state[2]])
+
+    def equations_of_motion(self, state, thrust):
+        """Time derivatives of the states of all robots under constant thrust.
+
+        Args:
+            state (np.array): (8, N) robot states, i.e., robot frame velocities vx, vy, vz [m/s], orientation phi [rad], angular velocity vphi [rad/s], and global displacement x, y, z [m]
+            thrust (tuple): Robot frame forces F_x, F_y, F_z [N] and moment M_phi [Nm], each (N,)
+
+        Returns:
+            np.array: (8, N) time derivatives of the states
+        """
+        F_x, F_y, F_z, M_phi = thrust
+        x_dot = state[0]
+        y_dot = state[1]
+        z_dot = state[2]
+        phi_dot = state[4]
+
+        C_dphi = self.C_dphi_static + self.C_dphi_static * 9 * np.abs(x_dot) / self.vx_max
+        C_dy = self.C_dy_static + self.C_dy_static * 4 * np.abs(x_dot) / self.vx_max
+        C_dx = np.where(x_dot > 0, self.C_dx_fwd, self.C_dx_bwd)
+
+        state_dot = np.empty_like(state)
+        state_dot[0] = 1/self.m_robot * (F_x - 1/2*self.rho*C_dx*self.A_x*np.sign(x_dot)*x_dot**2)
+        state_dot[1] = 1/self.m_robot * (F_y - 1/2*self.rho*C_dy*self.A_y*np.sign(y_dot)*y_dot**2)
+        state_dot[2] = 1/self.m_robot * (F_z - 1/2*self.rho*self.C_dz*self.A_z*np.sign(z_dot)*z_dot**2)
+        state_dot[3] = phi_dot
+        state_dot[4] = 1/self.I_robot * (M_phi - 1/2*self.rho*C_dphi*self.A_phi*np.sign(phi_dot)*(self.l_robot/6*phi_dot)**2)
+        state_dot[5:] = self.robot_to_global(state)
+
+        return state_dot
+
+    def euler(self, state, thrust):
+        """Original explicit Euler integration with fixed step deltat. Velocities and orientation are updated from the derivatives at the beginning of the step, the position with the updated velocities.
+
+        Args:
+            state (np.array): (8, N) robot states, see equations_of_motion()
+            thrust (tuple): Robot frame forces and moment, see equations_of_motion()
+
+        Returns:
+            np.array: (8, N) robot states after t_simu
+        """
+        for h in self.step_sizes():
+            state_dot = self.equations_of_motion(state, thrust)
+            state[:5] = state[:5] + h*state_dot[:5]
+            state[5:] = state[5:] + h*self.robot_to_global(state)
+            self.num_steps += 1
+
+        return state
+
+    def semi_implicit_euler(self, state, thrust):
+        """Semi-implicit Euler integration with fixed step deltat. Drag is linearized around the current velocities and treated implicitly, thrust explicitly. The quadratic drag can not make the velocities overshoot or oscillate anymore, which keeps large steps stable. Orientation and position are then advanced with the mean of the velocities at the beginning and the end of the step, so they follow the updated velocities to second order.
+
+        Args:
+            state (np.array): (8, N) robot states, see equations_of_motion()
+            thrust (tuple): Robot frame forces and moment, see equations_of_motion()
+
+        Returns:
+            np.array: (8, N) robot states after t_simu
+        """
+        F_x, F_y, F_z, M_phi = thrust
+
+        for h in self.step_sizes():
+            vx, vy, vz, phi, vphi = state[:5].copy()
+            vel_global = self.robot_to_global(state)
+
+            C_dphi = self.C_dphi_static + self.C_dphi_static * 9 * np.abs(vx) / self.vx_max
+            C_dy = self.C_dy_static + self.C_dy_static * 4 * np.abs(vx) / self.vx_max
+            C_dx = np.where(vx > 0, self.C_dx_fwd, self.C_dx_bwd)
+
+            # Drag coefficients linearized in the velocities, [1/s]
+            k_x = 1/2*self.rho*C_dx*self.A_x*np.abs(vx) / self.m_robot
+            k_y = 1/2*self.rho*C_dy*self.A_y*np.abs(vy) / self.m_robot
+            k_z = 1/2*self.rho*self.C_dz*self.A_z*np.abs(vz) / self.m_robot
+            k_phi = 1/2*self.rho*C_dphi*self.A_phi*(self.l_robot/6)**2*np.abs(vphi) / self.I_robot
+
+            state[0] = (vx + h*F_x/self.m_robot) / (1 + h*k_x)
+            state[1] = (vy + h*F_y/self.m_robot) / (1 + h*k_y)
+            state[2] = (vz + h*F_z/self.m_robot) / (1 + h*k_z)
+            state[4] = (vphi + h*M_phi/self.I_robot) / (1 + h*k_phi)
+            state[3] = phi + h*(vphi + state[4])/2
+            state[5:] = state[5:] + h*(vel_global + self.robot_to_global(state))/2
+            self.num_steps += 1
+
+        return state
+
+    def rk4(self, state, thrust):
+        """Classic fourth order Runge-Kutta integration with fixed step deltat.
+
+        Args:
+            state (np.array): (8, N) robot states, see equations_of_motion()
+            thrust (tuple): Robot frame forces and moment, see equations_of_motion()
+
+        Returns:
+            np.array: (8, N) robot states after t_simu
+        """
+        for h in self.step_sizes():
+            k1 = self.equations_of_motion(state, thrust)
+            k2 = self.equations_of_motion(state + h/2*k1, thrust)
+            k3 = self.equations_of_motion(state + h/2*k2, thrust)
+            k4 = self.equations_of_motion(state + h*k3, thrust)
+            state = state + h/6*(k1 + 2*k2 + 2*k3 + k4)
+            self.num_steps += 1
+
+        return state
+
+    def rk45(self, state, thrust):
+        """Adaptive Runge-Kutta integration with the Dormand-Prince 5(4) pair. All robots share one step size, which is controlled by the largest error estimate in the batch and carried over to the next call. A step is accepted if every state error is below tol * (1 + |state|). Like the fixed-step integrators, a step with a non-finite error is accepted and carries the NaN on.
+
+        Args:
+            state (np.array): (8, N) robot states, see equations_of_motion()
+            thrust (tuple): Robot frame forces and moment, see equations_of_motion()
+
+        Returns:
+            np.array: (8, N) robot states after t_simu
+
+        Raises:
+            RuntimeError: If the step size falls below h_min
+        """
+        t = 0
+        k1 = self.equations_of_motion(state, thrust)
+
+        while self.t_simu - t > 1e-12:
+            h = min(self.h_adaptive, self.t_simu - t)
+
+            k = [k1]
+            for a in DP_A[1:]:
+                k.append(self.equations_of_motion(state + h*sum(a_j*k_j for a_j, k_j in zip(a, k)), thrust))
+            state_new = state + h*sum(b_j*k_j for b_j, k_j in zip(DP_B, k))
+            k.append(self.equations_of_motion(state_new, thrust))
+
+            error = h*sum(e_j*k_j for e_j, k_j in zip(DP_E, k))
+            scale = self.tol * (1 + np.maximum(np.abs(state), np.abs(state_new)))
+            error_max = np.max(np.abs(error) / scale) if error.size else 0
+
+            if not np.isfinite(error_max):
+                # Error control cannot recover from NaN or inf, keep the step size
+                t += h
+                state = state_new
+                k1 = k[-1]
+                self.num_steps += 1
+                continue
+
+            if error_max <= 1:
+                t += h
+                state = state_new
+                k1 = k[-1] # first same as last
+                self.num_steps += 1
+
+            # Grow or shrink step by at most a factor 5, but keep it if only the last step was cut short
+            if error_max == 0:
+                factor = 5
+            else:
+                factor = min(5, max(0.2, 0.9 * error_max**(-1/5)))
+            if error_max > 1 or h == self.h_adaptive:
+                self.h_adaptive = min(h * factor, self.t_simu)
+            if error_max > 1 and self.h_adaptive < self.h_min:
+                raise RuntimeError('rk45 step size {:.3g} s fell below h_min = {:.3g} s'.format(self.h_adaptive, self.h_min))
+
+        return state
@@ -3,6 +3,11 @@ import numpy as np
 
 from scipy.spatial.distance import cdist
 
+from spatial import GridIndex, KDTreeIndex
+
+DIST_MODES = ('full', 'incremental', 'deferred')
+SPATIAL_INDICES = ('grid', 'kdtree')
+
 
 class Environment():
     """The dynamic network of robot nodes in the underwater environment
@@ -27,7 +32,9 @@ class Environment():
         conn_thres=math.inf,
         conn_drop=1,
         noise_magnitude=0.1,
-        verbose=False
+        verbose=False,
+        dist_mode='full',
+        spatial_index=None
     ):
         """Create a new environment for the fish
 
@@ -51,7 +58,31 @@ class Environment():
                 (default: {0.1})
             verbose {bool} -- If `true` print some information during
                 simulation (default: {False})
+            dist_mode {str} -- How pairwise distances are kept up to date;
+                'full' recomputes all distances on every move, 'incremental'
+                only the row and column of the moved node, and 'deferred'
+                recomputes all distances once per clock tick in
+                `commit_moves()`, which the observer calls once per clock
+                tick, after all fish moved in the lock-step engine.
+                Connection probabilities within a tick then use the
+                distances of the last commit. (default: {'full'})
+            spatial_index {str} -- Keep the nodes in a uniform 'grid' with
+                cells of size conn_thres or in a 'kdtree' instead of a dense
+                distance matrix. Distances are then computed per pair,
+                radius queries only check nearby nodes, and dist_mode does
+                not apply. (default: {None})
         """
+        if dist_mode not in DIST_MODES:
+            raise ValueError('Unknown dist_mode "{}", choose one of {}'.format(
+                dist_mode, DIST_MODES
+            ))
+        if spatial_index is not None and spatial_index not in SPATIAL_INDICES:
+            raise ValueError('Unknown spatial_index "{}", choose one of {}'.format(
+                spatial_index, SPATIAL_INDICES
+            ))
+        if spatial_index == 'grid' and math.isinf(conn_thres):
+            raise ValueError('A grid index requires a finite conn_thres')
+
         # Params
         self.arena_size = arena_size
         self.node_pos = node_pos
@@ -65,6 +96,14 @@ class Environment():
         self.noise_magnitude = noise_magnitude
         self.verbose = verbose
         self.prob_type = prob_type
+        self.dist_mode = dist_mode
+
+        self.node_dist = None
+        self.index = None
+        if spatial_index == 'grid':
+            self.index = GridIndex(conn_thres, metric='cityblock')
+        elif spatial_index == 'kdtree':
+            self.index = KDTreeIndex(metric='cityblock')
 
         # Init
         # restrict to tank
@@ -110,13 +149,52 @@ class Environment():
 
         self.node_pos[source_index] = new_pos
 
-        self.update_distance()
+        if self.index is not None or self.dist_mode == 'incremental':
+            self.update_distance(source_index)
+        elif self.dist_mode == 'full':
+            self.update_distance()
 
         if self.verbose:
             print('Env: {} is now at {}'.format(
                 source_index, new_pos, self.node_pos
             ))
 
+    def get_distorted_pos_all(self, target_pos):
+        """Calculate the distorted target positions of all nodes at once.
+
+        Vectorized version of `get_distorted_pos()`.
+
+        Arguments:
+            target_pos {np.array} -- Ideal target positions (N x 3) to be
+                distorted
+
+        Returns:
+            np.array -- Final positions of all nodes.
+        """
+        # Simulate random noise in [-1,1]
+        noise = (
+            np.random.rand(*target_pos.shape) * 2 - 1
+        ) * self.noise_magnitude
+
+        return target_pos + noise
+
+    def set_pos_all(self, new_pos):
+        """Set the new positions of all nodes
+
+        Save all new positions and update the distances only once.
+
+        Arguments:
+            new_pos {np.array} -- New node positions (N x 3) to be set.
+        """
+
+        self.node_pos[:] = new_pos
+
+        if self.index is not None or self.dist_mode != 'deferred':
+            self.update_distance()
+
+        if self.verbose:
+            print('Env: all nodes moved')
+
     # def set_vel(self, source_index, old_pos, new_pos): #xx
     #     """Sets velocity of fish. Used to find orientation for blind spot in (old) vision experiments.
 
@@ -127,12 +205,99 @@ class Environment():
     #     """
     #     self.node_vel[source_index] = new_pos - old_pos
 
-    def update_distance(self):
+    def update_distance(self, source_index=None):
         """Calculate pairwise distances of every node
 
-        Calculate and saves the pairwise distance of every node.
+        Calculate and saves the pairwise distance of every node. If a source
+        index is given, only the distances from and to that node are updated.
+        With a spatial index, the index is updated instead.
+
+        Keyword Arguments:
+            source_index {int} -- Index of the node that moved, or None to
+                update all distances (default: {None})
         """
-        self.node_dist = cdist(self.node_pos, self.node_pos, 'cityblock') #xx 3D manhattan distance
+        if self.index is not None:
+            if source_index is None:
+                self.index.build(self.node_pos)
+            else:
+                self.index.move(source_index)
+            return
+
+        if source_index is None:
+            self.node_dist = cdist(self.node_pos, self.node_pos, 'cityblock') #xx 3D manhattan distance
+            return
+
+        dist = cdist(self.node_pos[source_index:source_index+1], self.node_pos, 'cityblock')[0]
+        self.node_dist[source_index, :] = dist
+        self.node_dist[:, source_index] = dist
+
+    def commit_moves(self):
+        """Commit all moves of one clock tick
+
+        In 'deferred' mode the pairwise distances are recomputed only here,
+        once all nodes have moved. Other modes keep the distances up to date
+        on every move already.
+        """
+        if self.dist_mode == 'deferred':
+            self.update_distance()
+
+    def distance(self, node_a_index, node_b_index):
+        """Distance between two nodes
+
+        Looked up in the distance matrix, or computed from the positions when
+        a spatial index is used.
+
+        Arguments:
+            node_a_index {int} -- Node A index
+            node_b_index {int} -- Node B index
+
+        Returns:
+            float -- Distance between the nodes
+        """
+        if self.index is None:
+            return self.node_dist[node_a_index, node_b_index]
+
+        return np.sum(np.abs(self.node_pos[node_a_index] - self.node_pos[node_b_index]))
+
+    def distance_all(self, source_index, target_indices):
+        """Distances from one node to several nodes at once
+
+        Vectorized version of `distance()`.
+
+        Arguments:
+            source_index {int} -- Index of the source node
+            target_indices {np.array} -- Indices of the target nodes
+
+        Returns:
+            np.array -- Distances to all target nodes
+        """
+        if self.index is None:
+            return self.node_dist[source_index, target_indices]
+
+        return np.sum(np.abs(self.node_pos[target_indices] - self.node_pos[source_index]), axis=1)
+
+    def neighbors(self, source_index, radius=None):
+        """Find all nodes within a radius around a node
+
+        Arguments:
+            source_index {int} -- Index of the node in the center
+
+        Keyword Arguments:
+            radius {float} -- Search radius, conn_thres if None
+                (default: {None})
+
+        Returns:
+            np.array -- Sorted indices of all other nodes within the radius
+        """
+        if radius is None:
+            radius = self.conn_thres
+
+        if self.index is None:
+            candidates = np.flatnonzero(self.node_dist[source_index] <= radius)
+        else:
+            candidates = self.index.query(self.node_pos[source_index], radius)
+
+        return candidates[candidates != source_index]
 
     def prob(self, node_a_index, node_b_index):
         """Calculate the probability of connectivity of two points based on
@@ -145,7 +310,7 @@ class Environment():
         Returns:
             float -- probability of connectivity
         """
-        distance = self.node_dist[node_a_index, node_b_index]
+        distance = self.distance(node_a_index, node_b_index)
         return self.prob_dist(distance)
 
     def prob_dist(self, distance):
@@ -167,6 +332,29 @@ class Environment():
         # Binary connectivity by default
         return self.prob_binary(distance)
 
+    def prob_dist_all(self, distances):
+        """Probabilities of connectivity for several distances at once
+
+        Vectorized version of `prob_dist()`.
+
+        Arguments:
+            distances {np.array} -- Eucledian distances
+
+        Returns:
+            np.array -- probabilities of connectivity
+        """
+        if self.prob_type == 'quadratic':
+            return np.where(
+                distances > self.conn_thres,
+                0,
+                np.maximum(self.conn_thres, (distances + 1)**-2)
+            )
+        if self.prob_type == 'sigmoid':
+            return self.prob_sigmoid(distances)
+
+        # Binary connectivity by default
+        return np.where(distances > self.conn_thres, 0, 1)
+
     def prob_binary(self, distance):
         """Simulate binary connectivity probability
 
@@ -647,7 +647,7 @@ class Fish():
         self.depth_ctrl(r_move_g)
         self.home(r_move_g)
 
-        self.dynamics.update_ctrl(self.dorsal, self.caudal, self.pect_r, self.pect_l)
+        self.dynamics.update_ctrl(self.dorsal, self.caudal, self.pect_r, self.pect_l, self.id)
         final_move = self.dynamics.simulate_move(self.id)
 
         return final_move
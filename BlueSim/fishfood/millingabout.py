@@ -667,7 +667,7 @@ class Fish():
 
         #self.collisions(obstacle_avoidance)
 
-        self.dynamics.update_ctrl(self.dorsal, self.caudal, self.pect_r, self.pect_l)
+        self.dynamics.update_ctrl(self.dorsal, self.caudal, self.pect_r, self.pect_l, self.id)
         final_move = self.dynamics.simulate_move(self.id)
 
         # Cap the length of the move (OLD SIMULATOR)
@@ -0,0 +1,164 @@
+"""Accuracy versus cost of the integrators in `dynamics.py` on the orbit and waltz scenarios from `fishfood/`.
+
+Every scenario runs noise-free with the lock-step engine, once with a fine RK4 reference and once per integrator setting. Reports wall time, integration steps per robot and tick, and the maximum and final position error against the reference.
+
+Run from the BlueSim directory:
+
+    python integrator_benchmark.py
+"""
+import importlib.util
+import math
+import os
+import random
+import time
+import numpy as np
+
+from channel import Channel
+from dynamics import Dynamics
+from environment import Environment
+from events import Homing
+from interaction import Interaction
+from observer import Observer
+from utils import generate_distortion, run_lockstep_simulation
+
+ARENA_SIZE = np.array([1780, 1780, 1170])
+
+SCENARIOS = {
+    'orbit': {
+        'node_pos': np.array([[1600, 1600, 50]], dtype=float),
+        'node_phi': np.array([7/8 * math.pi]),
+        'homing': True
+    },
+    'waltz': {
+        'node_pos': np.array([[1780/2+300, 1780/2-200, 1170/2-50], [1780/2-500, 1780/2, 1170/2+100]]),
+        'node_phi': np.array([0.4 * math.pi, 1.6 * math.pi]),
+        'homing': False
+    }
+}
+
+# (integrator, deltat, tol)
+SETTINGS = [
+    ('euler', 0.1, None),
+    ('euler', 0.05, None),
+    ('euler', 0.01, None),
+    ('semi_implicit', 0.5, None),
+    ('semi_implicit', 0.1, None),
+    ('semi_implicit', 0.01, None),
+    ('rk4', 0.5, None),
+    ('rk4', 0.25, None),
+    ('rk4', 0.1, None),
+    ('rk45', 0.1, 1e-4),
+    ('rk45', 0.1, 1e-6),
+    ('rk45', 0.1, 1e-8)
+]
+REFERENCE = ('rk4', 0.01, None)
+
+
+def load_fish_class(behavior):
+    """Loads the Fish class of a behavior in fishfood/.
+
+    Args:
+        behavior (str): File name of the behavior without extension, e.g. 'orbit'
+
+    Returns:
+        class: Fish class of the behavior
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fishfood', behavior + '.py')
+    spec = importlib.util.spec_from_file_location(behavior, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module.Fish
+
+
+def run_scenario(name, integrator, deltat, tol=None, num_ticks=90, seed=0):
+    """Runs a scenario noise-free with the lock-step engine.
+
+    Args:
+        name (str): 'orbit' or 'waltz'
+        integrator (str): Integrator of the dynamics
+        deltat (float): Integration step, [s]
+        tol (float, optional): Error tolerance for 'rk45'
+        num_ticks (int, optional): Number of clock ticks
+        seed (int, optional): Seed of the random number generators
+
+    Returns:
+        tuple: Global positions (num_ticks, N, 3) [mm], wall time [s], and integration steps per robot and tick
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+
+    scenario = SCENARIOS[name]
+    num_fish = scenario['node_pos'].shape[0]
+
+    environment = Environment(
+        arena_size=ARENA_SIZE,
+        node_pos=scenario['node_pos'].copy(),
+        node_vel=np.zeros((num_fish, 3)),
+        node_phi=scenario['node_phi'].copy(),
+        node_vphi=np.zeros((num_fish, 1)),
+        distortion=generate_distortion(type='none', n=math.ceil(ARENA_SIZE[0]/10)+1),
+        prob_type='binary',
+        conn_thres=3000,
+        conn_drop=1,
+        noise_magnitude=0
+    )
+    interaction = Interaction(environment)
+    channel = Channel(environment)
+    if integrator == 'rk45':
+        dynamics = Dynamics(environment, integrator=integrator, deltat=deltat, tol=tol)
+    else:
+        dynamics = Dynamics(environment, integrator=integrator, deltat=deltat)
+
+    Fish = load_fish_class(name)
+    fish = [
+        Fish(
+            id=i,
+            channel=channel,
+            interaction=interaction,
+            dynamics=dynamics,
+            target_dist=130*1.75,
+            lim_neighbors=[2, 3],
+            fish_max_speed=130
+        ) for i in range(num_fish)
+    ]
+    channel.set_nodes(fish)
+
+    observer = Observer(fish=fish, environment=environment, channel=channel)
+    if scenario['homing']:
+        for i in range(1, num_ticks):
+            observer.instruct(event=Homing(), rel_clock=i, pos=ARENA_SIZE/2, fish_all=True)
+
+    start = time.time()
+    run_lockstep_simulation(fish, observer, num_ticks=num_ticks)
+    wall_time = time.time() - start
+
+    pos = np.stack((observer.x, observer.y, observer.z), axis=2).transpose(1, 0, 2)
+    steps = dynamics.num_steps / (num_fish * max(1, num_ticks - 2)) # fish do not move during the first two ticks
+
+    return pos, wall_time, steps
+
+
+def benchmark(num_ticks=90):
+    """Prints accuracy and cost of all integrator settings on all scenarios.
+
+    Args:
+        num_ticks (int, optional): Number of clock ticks per run
+    """
+    for name in SCENARIOS:
+        ref_pos, ref_time, ref_steps = run_scenario(name, *REFERENCE, num_ticks=num_ticks)
+
+        print('\n{} ({} ticks), reference {} dt={}s: {:.2f}s'.format(name, num_ticks, REFERENCE[0], REFERENCE[1], ref_time))
+        print('{:<14} {:>6} {:>8} {:>10} {:>10} {:>14} {:>14}'.format(
+            'integrator', 'dt [s]', 'tol', 'time [s]', 'steps/tick', 'max err [mm]', 'final err [mm]'))
+
+        for integrator, deltat, tol in SETTINGS:
+            pos, wall_time, steps = run_scenario(name, integrator, deltat, tol, num_ticks=num_ticks)
+            error = np.linalg.norm(pos - ref_pos, axis=2)
+
+            print('{:<14} {:>6} {:>8} {:>10.3f} {:>10.1f} {:>14.3f} {:>14.3f}'.format(
+                integrator, deltat, '-' if tol is None else tol, wall_time, steps, np.max(error), np.max(error[-1])))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -194,3 +194,30 @@ class Interaction():
             print('Interaction: {} moved to {}'.format(
                 source_id, final_pos
             ))
+
+    def move_all(self, target_directions):
+        """Move all fish at once
+
+        Vectorized version of `move()` for a whole swarm. Restricts the target
+        positions to the tank, adds noise, and updates the distances between
+        the fish only once.
+
+        Arguments:
+            target_directions {np.array} -- Relative directions (N x 3) to
+                move to
+        """
+        arena_size = self.environment.arena_size
+
+        # Restrict to tank
+        target_pos = np.clip(
+            self.environment.node_pos + target_directions, 0, arena_size
+        )
+
+        final_pos = np.clip(
+            self.environment.get_distorted_pos_all(target_pos), 0, arena_size
+        )
+
+        self.environment.set_pos_all(final_pos)
+
+        if self.verbose:
+            print('Interaction: all fish moved')
@@ -9,6 +9,8 @@ from eventcodes import (
     INFO_EXTERNAL, INFO_INTERNAL, START_HOP_COUNT, HOP_COUNT,
     START_LEADER_ELECTION, LEADER_ELECTION
 )
+from recorder import Recorder
+from store import TrajectoryStore
 
 # 21 categorical colors. Used for plotting
 colors = [
@@ -46,7 +48,11 @@ class Observer():
         channel,
         clock_freq=1,
         fish_pos=None,
-        verbose=False
+        verbose=False,
+        max_history=None,
+        store=None,
+        record=None,
+        record_fish=None
     ):
         """Create a god-like observer!
 
@@ -62,6 +68,20 @@ class Observer():
                 fish (default: {1})
             fish_pos {np.array} -- Initial fish positions (default: {None})
             verbose {bool} -- If `true` log out some stuff (default: {False})
+            max_history {int} -- Keep only the most recent samples of every
+                recorded series, so memory stays bounded however long the
+                simulation runs. Keep all samples if None.
+                (default: {None})
+            store {str} -- Directory to stream all recorded series to. The
+                series can be loaded lazily with `TrajectoryStore.open()`
+                even for runs that do not fit into memory. (default: {None})
+            record {dict} -- Fields to record, 'pos', 'vel', 'status',
+                'd_mean', or 'messages', mapped to the number of ticks between
+                two samples, e.g., `{'pos': 10}` for every tenth position.
+                Record all fields at every tick if None. (default: {None})
+            record_fish {list} -- Ids of the fish whose positions, velocities,
+                and status are recorded. Record all fish if None.
+                (default: {None})
         """
         self.environment = environment
         self.fish = fish
@@ -74,29 +94,41 @@ class Observer():
         self.clock = 0
 
         self.num_nodes = self.environment.node_pos.shape[0]
-        self.x = []
-        self.y = []
-        self.z = []
-        self.vx = []
-        self.vy = []
-        self.vz = []
         self.v_mean = []
-        self.d_mean = []
         self.c = []
-        self.status = []
         self.reset = False
 
+        self.record_fish = None
+        num_recorded = self.num_nodes
+        if record_fish is not None:
+            self.record_fish = np.array(record_fish, dtype=int)
+            num_recorded = self.record_fish.size
+
+        # Positions, planar velocities, and connectivity status of the
+        # recorded fish, the mean distance to the center, and the number of
+        # intercepted messages, one slice per tick
+        if store is not None:
+            store = TrajectoryStore(
+                store,
+                num_nodes=self.num_nodes,
+                clock_freq=clock_freq,
+                node_ids=self.record_fish
+            )
+        self.recorder = Recorder(
+            max_history=max_history, store=store, spec=record
+        )
+        self.recorder.add('pos', (num_recorded, 3))
+        self.recorder.add('vel', (num_recorded, 2))
+        self.recorder.add('status', (num_recorded,), dtype=np.int8)
+        self.recorder.add('d_mean')
+        self.recorder.add('messages', dtype=int)
+        self.recorder.check_spec()
+        self.num_messages = 0
+
         self.node_colors = []
         for i in range(self.num_nodes):
             ii = i % 20
             self.node_colors.append(colors[ii])
-            self.x.append([])
-            self.y.append([])
-            self.z.append([])
-            self.vx.append([])
-            self.vy.append([])
-            self.vz.append([])
-            self.status.append([])
 
         self.is_started = False
 
@@ -160,6 +192,109 @@ class Observer():
         if fish_id is not None:
             self.object = self.environment.node_pos[fish_id]
 
+    def per_fish(self, samples):
+        """Arrange recorded samples by fish
+
+        Arguments:
+            samples {np.array} -- Samples of shape (T, n, ...) of the
+                recorded fish
+
+        Returns:
+            np.array -- Array of shape (N, T, ...), a view if all fish are
+                recorded. Rows of fish that are not recorded are NaN.
+        """
+        samples = np.moveaxis(samples, 1, 0)
+        if self.record_fish is None:
+            return samples
+
+        series = np.full((self.num_nodes,) + samples.shape[1:], np.nan)
+        series[self.record_fish] = samples
+
+        return series
+
+    @property
+    def x(self):
+        """Recorded x positions
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('pos')[:, :, 0])
+
+    @property
+    def y(self):
+        """Recorded y positions
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('pos')[:, :, 1])
+
+    @property
+    def z(self):
+        """Recorded z positions
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('pos')[:, :, 2])
+
+    @property
+    def vx(self):
+        """Recorded x velocities
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('vel')[:, :, 0])
+
+    @property
+    def vy(self):
+        """Recorded y velocities
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('vel')[:, :, 1])
+
+    @property
+    def vz(self):
+        """Recorded z velocities. Always zero, fish should be neutral pitch
+        in animations.
+
+        Returns:
+            np.array -- Zeros of shape (N, T)
+        """
+        return np.zeros((self.num_nodes, self.recorder.size('vel')))
+
+    @property
+    def status(self):
+        """Recorded connectivity status, -1 for too few, 0 for enough, and 1
+        for too many neighbors
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('status'))
+
+    @property
+    def d_mean(self):
+        """Recorded mean distance of the fish to their center
+
+        Returns:
+            np.array -- View of shape (T,)
+        """
+        return self.recorder.get('d_mean')
+
+    @property
+    def messages(self):
+        """Recorded number of intercepted messages per tick
+
+        Returns:
+            np.array -- View of shape (T,)
+        """
+        return self.recorder.get('messages')
+
     def start(self):
         """Start the process
 
@@ -174,6 +309,7 @@ class Observer():
         This sets `is_started` to false.
         """
         self.is_started = False
+        self.recorder.flush()
 
         if self.track_hop_count:
             self.study_data[0].append(self.track_hop_count_num_events)
@@ -190,10 +326,11 @@ class Observer():
             )
 
     def run(self):
-        """Run the process recursively
+        """Run the process
 
-        This method simulates the fish and calls `eval` on every clock tick as
-        long as the fish `is_started`.
+        This method calls `eval` on every clock tick in a loop as long as the
+        observer `is_started`. Alternatively, leave the observer stopped and
+        let `step_simulation()` call `eval` once per tick.
         """
         while self.is_started:
             time.sleep(self.clock_speed / 2)
@@ -238,6 +375,7 @@ class Observer():
 
             if self.reset and self.fish_pos is not None:
                 self.environment.node_pos = np.copy(self.fish_pos)
+                self.environment.update_distance()
 
             _, event, fish_id, pos, fish_all = self.instructions.get()
             if fish_id is not None:
@@ -327,9 +465,11 @@ class Observer():
         """
 
         not_saw_info = True
+        self.num_messages = 0
 
         while not self.transmissions.empty():
             event = self.transmissions.get()
+            self.num_messages += 1
 
             if event.opcode == INFO_INTERNAL:
                 not_saw_info = False
@@ -357,49 +497,44 @@ class Observer():
 
     def eval(self):
         """Save the position and connectivity status of the fish.
+
+        First commits the moves of the last clock tick to the environment, so
+        deferred distances are updated once per tick in the threaded as well
+        as the lock-step simulation.
         """
+        self.environment.commit_moves()
 
         self.check_transmissions()
         self.check_instructions()
 
-        # mean swarm speed for evaluation of aggregation/dispersion
-        d_mean = 0
-        #v_mean = 0
+        fish_ids = slice(None) if self.record_fish is None else self.record_fish
 
-        for i in range(self.num_nodes):
-            self.x[i].append(self.environment.node_pos[i, 0])
-            self.y[i].append(self.environment.node_pos[i, 1])
-            self.z[i].append(self.environment.node_pos[i, 2])
-
-            # ipyvolume quiver does not plot elements with zero velocity
-            #if self.environment.node_vel[i, 0] == 0: #xx
-            #    self.vx[i].append(math.cos(self.environment.node_phi[i]))
-            #else:
-            self.vx[i].append(self.environment.node_vel[i, 0])
-
-            #if self.environment.node_vel[i, 1] == 0: #xx
-            #    self.vy[i].append(math.sin(self.environment.node_phi[i]))
-            #else:
-            self.vy[i].append(self.environment.node_vel[i, 1])
-
-            # fish should be neutral pitch in animations > vz = 0
-            #self.vz[i].append(self.environment.node_vel[i, 2])
-            self.vz[i].append(0)
-
-            d_mean += self.fish[i].d_center
-            #v_mean += math.sqrt(self.vx[i]**2 + self.vy[i]**2 + self.vz[i]**2)
-
-            n = len(self.fish[i].neighbors)
-
-            if n < self.fish[i].lim_neighbors[0]:
-                self.status[i].append(-1)
-            elif n > self.fish[i].lim_neighbors[1]:
-                self.status[i].append(1)
-            else:
-                self.status[i].append(0)
+        if self.recorder.records('pos', self.clock):
+            self.recorder.append('pos', self.environment.node_pos[fish_ids])
 
-        self.d_mean.append(d_mean/self.num_nodes)
-        #self.v_mean.append(v_mean/self.num_nodes)
+        if self.recorder.records('vel', self.clock):
+            self.recorder.append(
+                'vel', self.environment.node_vel[fish_ids, :2]
+            )
+
+        if self.recorder.records('status', self.clock):
+            fish = self.fish
+            if self.record_fish is not None:
+                fish = [self.fish[i] for i in self.record_fish]
+            n = np.array([len(f.neighbors) for f in fish])
+            lim = np.array([f.lim_neighbors for f in fish])
+            self.recorder.append(
+                'status', (n > lim[:, 1]).astype(np.int8) - (n < lim[:, 0])
+            )
+
+        # mean swarm distance for evaluation of aggregation/dispersion
+        if self.recorder.records('d_mean', self.clock):
+            self.recorder.append(
+                'd_mean', np.mean([fish.d_center for fish in self.fish])
+            )
+
+        if self.recorder.records('messages', self.clock):
+            self.recorder.append('messages', self.num_messages)
 
         self.clock += 1
 
@@ -436,35 +571,44 @@ class Observer():
                 alpha=0.5
             )
 
+        x, y, z, status = self.x, self.y, self.z, self.status
+        if status.shape[1] != x.shape[1]:
+            # Status markers need a status sample for every position
+            status = np.zeros((self.num_nodes, 0))
+
         # connection lines, no scatter here!
         for i in range(self.num_nodes):
+            if not np.isfinite(x[i]).any():
+                # Fish was not recorded
+                continue
+
             c = self.node_colors[i]
             if i != 0 and not i % 20 and dark:
                 c = [1.0, 1.0, 1.0, 1.0]
 
             ax.plot(
-                self.x[i],
-                self.y[i],
-                self.z[i],
+                x[i],
+                y[i],
+                z[i],
                 c=c,
                 linewidth=4.0,
                 alpha=0.66
             )
 
-            if len(self.status[i]) < 100:
-                for j in range(1, len(self.status[i])-1):
+            if len(status[i]) < 100:
+                for j in range(1, len(status[i])-1):
                     face = c
                     edge = c
-                    if self.status[i][j] == 0:
+                    if status[i][j] == 0:
                         marker = 'None'
                     else:
                         marker = 'o'
-                        face = 'black' if self.status[i][j] == -1 else c
+                        face = 'black' if status[i][j] == -1 else c
 
                     ax.scatter(
-                        self.x[i][j],
-                        self.y[i][j],
-                        self.z[i][j],
+                        x[i][j],
+                        y[i][j],
+                        z[i][j],
                         marker=marker,
                         facecolors=face,
                         edgecolors=edge,
@@ -473,18 +617,18 @@ class Observer():
                     )
 
             ax.scatter(
-                self.x[i][0],
-                self.y[i][0],
-                self.z[i][0],
+                x[i][0],
+                y[i][0],
+                z[i][0],
                 c=c,
                 marker='>',
                 s=200,
                 alpha=1
             )
             ax.scatter(
-                self.x[i][-1],
-                self.y[i][-1],
-                self.z[i][-1],
+                x[i][-1],
+                y[i][-1],
+                z[i][-1],
                 c=c,
                 marker='s',
                 s=50,
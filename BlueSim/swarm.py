@@ -0,0 +1,196 @@
+"""Vectorized swarm of BlueBots. Holds fin controls, behaviors, and targets of all robots in NumPy arrays and updates the whole swarm with masked array operations on every tick instead of calling `Fish.move` once per robot.
+"""
+import math
+import numpy as np
+
+# Behaviors
+HOME = 0
+TRANSITION = 1
+ORBIT = 2
+
+
+class Swarm():
+
+    """Structure-of-arrays version of the orbiting behavior in `fish.py` (home, transition, orbit and depth control) for N BlueBots at once.
+
+    Attributes:
+        behavior (np.array): (N,) behavior of every robot, HOME, TRANSITION, or ORBIT
+        body_length (int): Length of a BlueBot (130mm)
+        caudal (np.array): (N,) caudal fin controls
+        clock (int): Swarm clock time
+        dorsal (np.array): (N,) dorsal fin controls
+        dynamics (Class): Fish dynamics model
+        environment (Class): For global positions, velocities, and orientations
+        interaction (Class): Class for interactions between fish and environment
+        num_fish (int): Number of robots N
+        pect_l (np.array): (N,) pectoral left fin controls
+        pect_r (np.array): (N,) pectoral right fin controls
+        target_dist (int): Target orbiting radius, [mm]
+        target_pos (np.array): (N, 3) global target position of every robot
+        transition_ratio (float): Robots switch from homing to transition below target_dist * transition_ratio
+    """
+
+    def __init__(
+        self,
+        interaction,
+        dynamics,
+        target_pos=None,
+        target_dist=400,
+        transition_ratio=1.2,
+        body_length=130
+    ):
+        """Create a new swarm
+
+        Args:
+            interaction (Class): Class for interactions between fish and environment
+            dynamics (Class): Fish dynamics model
+            target_pos (np.array, optional): Global target position(s) of the robots, either (3,) for all or (N, 3)
+            target_dist (int, optional): Target orbiting radius, [mm]
+            transition_ratio (float, optional): Robots switch from homing to transition below target_dist * transition_ratio
+            body_length (int, optional): Length of a BlueBot, [mm]
+        """
+        self.interaction = interaction
+        self.environment = interaction.environment
+        self.dynamics = dynamics
+        self.target_dist = target_dist
+        self.transition_ratio = transition_ratio
+        self.body_length = body_length
+
+        self.num_fish = self.environment.node_pos.shape[0]
+        self.clock = 0
+
+        self.caudal = np.zeros((self.num_fish,))
+        self.dorsal = np.zeros((self.num_fish,))
+        self.pect_r = np.zeros((self.num_fish,))
+        self.pect_l = np.zeros((self.num_fish,))
+        self.behavior = np.full((self.num_fish,), HOME, dtype=np.int8)
+
+        self.target_pos = np.zeros((self.num_fish, 3))
+        if target_pos is not None:
+            self.target_pos[:] = target_pos
+
+    def rel_targets(self):
+        """Relative positions of all targets in the robot frames.
+
+        Returns:
+            np.array: (N, 3) relative target positions in robot coordinates
+        """
+        g_move = self.target_pos - self.environment.node_pos
+        phi = np.reshape(self.environment.node_phi, (self.num_fish,))
+        cos_phi = np.cos(phi)
+        sin_phi = np.sin(phi)
+
+        r_move_g = np.empty((self.num_fish, 3))
+        r_move_g[:, 0] = cos_phi * g_move[:, 0] + sin_phi * g_move[:, 1]
+        r_move_g[:, 1] = -sin_phi * g_move[:, 0] + cos_phi * g_move[:, 1]
+        r_move_g[:, 2] = g_move[:, 2]
+
+        return r_move_g
+
+    def depth_ctrl(self, r_move_g):
+        """Controls diving depth based on direction of desired moves.
+
+        Args:
+            r_move_g (np.array): (N, 3) relative positions of desired goal locations in robot frames.
+        """
+        pitch = np.arctan2(r_move_g[:, 2], np.hypot(r_move_g[:, 0], r_move_g[:, 1])) * 180 / math.pi
+
+        self.dorsal[pitch > 1] = 1
+        self.dorsal[pitch < -1] = 0
+
+    def home(self, r_move_g, heading, mask):
+        """Homing behavior. Sets fin controls to move toward desired goal locations.
+
+        Args:
+            r_move_g (np.array): (N, 3) relative positions of desired goal locations in robot frames.
+            heading (np.array): (N,) headings toward the goal locations, [deg]
+            mask (np.array): (N,) robots that are homing
+        """
+        caudal_range = 20 # abs(heading) below which caudal fin is switched on
+
+        right = mask & (heading > 0)
+        left = mask & ~(heading > 0)
+        pect = np.minimum(1, 0.6 + np.abs(heading) / 180)
+        caudal = np.minimum(0.2, 0.1 + np.hypot(r_move_g[:, 0], r_move_g[:, 1]) / (8*self.body_length))
+        caudal_on = np.abs(heading) < caudal_range
+
+        # target to the right
+        self.pect_l[right] = pect[right]
+        self.pect_r[right] = 0
+
+        # target to the left
+        self.pect_r[left] = pect[left]
+        self.pect_l[left] = 0
+
+        self.caudal[mask] = np.where(caudal_on, caudal, 0)[mask]
+
+    def transition(self, heading, mask):
+        """Transitions between homing and orbiting. Uses pectoral right fin to align tangentially with the orbit.
+
+        Args:
+            heading (np.array): (N,) headings toward the goal locations, [deg]
+            mask (np.array): (N,) robots that are in transition
+        """
+        aligned = mask & (heading > 35)
+
+        self.caudal[mask] = 0
+        self.pect_l[mask] = 0
+        self.pect_r[mask] = 1
+
+        self.pect_r[aligned] = 0
+        self.behavior[aligned] = ORBIT
+
+    def orbit(self, r_move_g, heading, mask):
+        """Orbits the targets at the predefined radius self.target_dist with four zones for pectoral and caudal fins.
+
+        Args:
+            r_move_g (np.array): (N, 3) relative positions of desired goal locations in robot frames.
+            heading (np.array): (N,) headings toward the goal locations, [deg]
+            mask (np.array): (N,) robots that are orbiting
+        """
+        outside = np.hypot(r_move_g[:, 0], r_move_g[:, 1]) > self.target_dist # 2D, ignoring z
+        ahead = heading < 90
+
+        self.caudal[mask] = 0.45
+        self.pect_l[mask] = 0
+        self.pect_r[mask] = 0
+
+        self.caudal[mask & outside & ~ahead] = 0.3
+        self.pect_l[mask & outside & ~ahead] = 1
+        self.pect_r[mask & ~outside & ahead] = 1
+
+    def move(self):
+        """Update fin controls of all robots and simulate their dynamics.
+
+        Returns:
+            np.array: (N, 3) relative moves of all robots in global coordinates
+        """
+        r_move_g = self.rel_targets()
+        heading = np.arctan2(r_move_g[:, 1], r_move_g[:, 0]) * 180 / math.pi
+
+        self.depth_ctrl(r_move_g)
+
+        # Behaviors are evaluated on the state at the beginning of the tick
+        homing = self.behavior == HOME
+        transitioning = self.behavior == TRANSITION
+        orbiting = self.behavior == ORBIT
+
+        arrived = homing & (np.linalg.norm(r_move_g, axis=1) < self.target_dist * self.transition_ratio)
+        self.behavior[arrived] = TRANSITION
+
+        self.home(r_move_g, heading, homing & ~arrived)
+        self.transition(heading, transitioning)
+        self.orbit(r_move_g, heading, orbiting)
+
+        self.dynamics.update_ctrl(self.dorsal, self.caudal, self.pect_r, self.pect_l)
+
+        return self.dynamics.simulate_moves()
+
+    def tick(self):
+        """Advance all robots by one clock tick.
+        """
+        if self.clock > 1:
+            self.interaction.move_all(self.move())
+            self.environment.commit_moves()
+
+        self.clock += 1
@@ -287,3 +287,69 @@ def run_simulation(
     # Ciao stops run time
     threading.Timer(run_time, stop).start()
     observer_thread.join() #xx uncomment
+
+
+def step_simulation(fish, observer):
+    """Advance all fish and the observer by exactly one clock tick.
+
+    Every fish first evaluates its queue and moves, then the observer records
+    the swarm and broadcasts due instructions, and finally every fish
+    communicates. This is the same order the threaded simulation aims for but
+    without any sleeping.
+
+    Arguments:
+        fish {list} -- List of fish instances
+        observer {Observer} -- Observer instance
+    """
+    for f in fish:
+        f.eval()
+
+    observer.eval()
+
+    for f in fish:
+        f.communicate()
+
+
+def run_lockstep_simulation(fish, observer, num_ticks=10):
+    """Run the simulation synchronously for a fixed number of clock ticks.
+
+    Unlike `run_simulation()` no threads are started and nothing sleeps, so the
+    simulation runs as fast as the CPU allows and always covers exactly
+    `num_ticks` clock cycles.
+
+    Arguments:
+        fish {list} -- List of fish instances
+        observer {Observer} -- Observer instance
+
+    Keyword Arguments:
+        num_ticks {int} -- Total number of clock ticks (default: {10})
+    """
+    for _ in range(num_ticks):
+        step_simulation(fish, observer)
+
+    observer.stop()
+
+
+def run_swarm_simulation(swarm, num_ticks=10):
+    """Run a vectorized swarm synchronously for a fixed number of clock ticks.
+
+    Arguments:
+        swarm {Swarm} -- Swarm instance
+
+    Keyword Arguments:
+        num_ticks {int} -- Total number of clock ticks (default: {10})
+
+    Returns:
+        tuple -- Positions and velocities of all fish, each of shape
+            (num_ticks, N, 3)
+    """
+    environment = swarm.environment
+    pos = np.zeros((num_ticks, swarm.num_fish, 3))
+    vel = np.zeros((num_ticks, swarm.num_fish, 3))
+
+    for t in range(num_ticks):
+        swarm.tick()
+        pos[t] = environment.node_pos
+        vel[t] = environment.node_vel
+
+    return pos, vel
@@ -3,7 +3,10 @@ import numpy as np
 from queue import Queue
 import time
 import datetime
-import pandas as pd 
+import threading
+from collections import OrderedDict
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial.distance import cdist
 from events import HopCount, Ping, InfoInternal, LeaderElection
 from eventcodes import (
     PING, HOMING, HOP_COUNT, INFO_EXTERNAL, INFO_INTERNAL, START_HOP_COUNT,
@@ -11,6 +14,82 @@ from eventcodes import (
 )
 from math import sqrt
 from math import ceil
+
+
+def sort_order(values, ascending=True):
+    """Order of the indices that sorts values like pandas' `sort_values()`
+
+    Arguments:
+        values {np.array} -- Values to sort
+
+    Keyword Arguments:
+        ascending {bool} -- Sort ascending if True (default: {True})
+
+    Returns:
+        np.array -- Indices of the values in sorted order, NaNs last
+    """
+    values = np.asarray(values)
+    index = np.arange(len(values))
+    nan = np.isnan(values)
+    non_nans = values[~nan]
+    non_nan_index = index[~nan]
+    if not ascending:
+        non_nans = non_nans[::-1]
+        non_nan_index = non_nan_index[::-1]
+    order = non_nan_index[non_nans.argsort(kind='quicksort')]
+    if not ascending:
+        order = order[::-1]
+    return np.concatenate((order, index[nan]))
+
+
+class FormationMaps():
+    """Least recently used cache of target formation maps
+
+    A target map only depends on the formation, the number of fish, and the
+    line space, so all fish share the maps instead of building them on every
+    clock tick. The maps are read-only.
+    """
+
+    def __init__(self, max_size=32):
+        """Create a new cache
+
+        Keyword Arguments:
+            max_size {int} -- Number of maps to keep (default: {32})
+        """
+        self.max_size = max_size
+        self.maps = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, map_type, n_fish, linespace, build):
+        """Get a target map and build it if it is not cached
+
+        Arguments:
+            map_type {int} -- 0 for the Fibonacci and 1 for the triangle map
+            n_fish {int} -- Number of fish
+            linespace {float} -- Ideal space between fish
+            build {function} -- Builds the map given `n_fish` and `linespace`
+
+        Returns:
+            np.array -- Read-only (n_fish, 3) target map
+        """
+        key = (map_type, n_fish, linespace)
+        with self.lock:
+            if key in self.maps:
+                self.maps.move_to_end(key)
+                return self.maps[key]
+
+            target_map = build(n_fish, linespace)
+            target_map.setflags(write=False)
+            self.maps[key] = target_map
+            if len(self.maps) > self.max_size:
+                self.maps.popitem(last=False)
+
+            return target_map
+
+
+formation_maps = FormationMaps()
+
+
 class Fish():
     """This class models each fish robot node in the network from the fish'
     perspective.
@@ -43,7 +122,9 @@ class Fish():
         clock_freq=1,
         neighbor_weight=1.0,
         name='Unnamed',
-        verbose=False
+        verbose=False,
+        assignment='greedy',
+        assignment_tolerance=0.1
     ):
         """Create a new fish
 
@@ -66,6 +147,12 @@ class Fish():
                 (default: {1.0})
             name {str} -- Unique name of the fish. (default: {'Unnamed'})
             verbose {bool} -- If `true` log out some stuff (default: {False})
+            assignment {str} -- How the global formations assign fish to
+                target slots. Can be `greedy` or `optimal`, see
+                `assign_target()`. (default: {'greedy'})
+            assignment_tolerance {float} -- The optimal assignment is reused
+                while no neighbor moved by more than this relative to the
+                leader. (default: {0.1})
         """
 
         self.id = id
@@ -77,6 +164,8 @@ class Fish():
         self.fish_total_error = fish_total_error
         self.neighbor_weight = neighbor_weight
         self.lim_neighbors = lim_neighbors
+        self.assignment = assignment
+        self.assignment_tolerance = assignment_tolerance
         self.fish_max_speed = fish_max_speed
         self.clock_freq = clock_freq
         self.name = name
@@ -88,6 +177,8 @@ class Fish():
         self.target_pos = np.zeros((2,))
         self.is_started = False
         self.neighbors = set()
+        self.last_assignment = None
+        self.is_leader = False  # No neighbor ahead in the last global formation move
 
         self.status = None
 
@@ -410,25 +501,50 @@ class Fish():
 
         return center
 
+    def neighbor_array(self, rel_pos):
+        """Relative positions and distances of all neighbors
+
+        Arguments:
+            rel_pos {dict} -- Dictionary of relative positions to the
+                neighboring fish.
+
+        Returns:
+            np.array -- (K, 3) array of x, y, and distance of every neighbor,
+                in the order of `rel_pos`
+        """
+        neighbors = np.zeros((len(rel_pos), 3))
+        if len(rel_pos) > 0:
+            neighbors[:, :2] = list(rel_pos.values())
+        neighbors[:, 2] = np.sqrt((neighbors[:, 0])**2 + (neighbors[:, 1])**2)
+
+        return neighbors
+
     # Start of Magaly's code 
     #Lists of target formations 
     def not_ocluded(self, rel_pos, r, fish_size):
-        rel_pos = rel_pos.sort_values(['dist'])
+        neighbors = self.neighbor_array(rel_pos)
+        ids = list(rel_pos.keys())
+        order = sort_order(neighbors[:, 2])
+        neighbors = neighbors[order]
+        ids = [ids[i] for i in order]
+        visible = np.ones(len(ids), dtype=bool)
         not_visible_fish = []
-        for index, neighbor in rel_pos.iterrows(): 
-            if(index not in not_visible_fish):
-                if(neighbor.dist> r):
-                    rel_pos = rel_pos.drop(index, axis=0)
-                    not_visible_fish.append(index)
+        for i, neighbor in enumerate(neighbors):
+            if(ids[i] not in not_visible_fish):
+                if(neighbor[2]> r):
+                    visible[i] = False
+                    not_visible_fish.append(ids[i])
                 else:
-                    m1 = (neighbor.Y+fish_size)/(neighbor.X)
-                    m2 = (neighbor.Y-fish_size)/(neighbor.X)
-                    for index2, neighbor2 in rel_pos.iterrows():
-                        if(neighbor2.Y<(neighbor2.Y*m1)and neighbor2.Y>(neighbor2.Y*m2) and neighbor2.X>neighbor.X):
-                            rel_pos = rel_pos.drop(index2, axis=0)
-                            not_visible_fish.append(index2)
-                            
-        return rel_pos, not_visible_fish
+                    m1 = (neighbor[1]+fish_size)/(neighbor[0])
+                    m2 = (neighbor[1]-fish_size)/(neighbor[0])
+                    for j in np.flatnonzero(visible):
+                        neighbor2 = neighbors[j]
+                        if(neighbor2[1]<(neighbor2[1]*m1)and neighbor2[1]>(neighbor2[1]*m2) and neighbor2[0]>neighbor[0]):
+                            visible[j] = False
+                            not_visible_fish.append(ids[j])
+
+        visible_fish = {ids[i]: rel_pos[ids[i]] for i in np.flatnonzero(visible)}
+        return visible_fish, not_visible_fish
     '''
     0) Trigonal planar: Three neighbors f_i is the center of the neighbors each neighbor is 120 degrees from each other.
     1) Triangle: Two neighbors. 60 degrees between my two neighbors. 
@@ -449,38 +565,29 @@ class Fish():
             f_i = self.F(i)
             i+=1
         return my_index-1, i-3,np.round(self.F(i-2)), np.round(self.F(i-1))
-    #returns dataframe with the target locations 
+    #returns (nfish, 3) array with the x, y, and index of the target locations
     def fibonacci_formation(self,nfish,linespace):
-        columns = ['X', 'Y', 'dist']
-        index= np.arange(nfish)
-        df= pd.DataFrame(index=index, columns=columns)
-        df= df.fillna(0.0)
-        #print(df)
-        for i,row in df.iterrows():
+        target_map = np.zeros((nfish, 3))
+        for i in range(nfish):
             my_index, my_row, rs, re = self.get_row_n(i)
             if(my_row<=0):
                 my_index =0
                 my_row =0
-            if(my_index in [0,1,2]):
-                df.iloc[i]['X'] = my_row*linespace
-                df.iloc[i]['dist'] = my_index
-                df.iloc[i]['Y'] = 0
-
-            else:
-                df.iloc[i]['X'] = my_row*linespace
-                df.iloc[i]['dist'] = my_index
+            target_map[i, 0] = my_row*linespace
+            target_map[i, 2] = my_index
+            if(my_index not in [0,1,2]):
                 if(re-rs ==2):
                     if(my_index==3):
-                        df.iloc[i]['Y'] =-.5
+                        target_map[i, 1] =-.5
                     else:
-                        df.iloc[i]['Y'] =.5
+                        target_map[i, 1] =.5
                 elif((re-rs)%2==0):
                     ys = np.linspace(-(re-rs)/2,int(re-rs)/2,int(re-rs))
-                    df.iloc[i]['Y'] = ys[int(my_index -rs)]
+                    target_map[i, 1] = ys[int(my_index -rs)]
                 else:
-                    df.iloc[i]['Y'] = ceil((re-rs)/2) - (re-my_index)
-        df['X'] = -df['X']
-        return df
+                    target_map[i, 1] = ceil((re-rs)/2) - (re-my_index)
+        target_map[:, 0] = -target_map[:, 0]
+        return target_map
 
     #############################################################################################
     #Triangle_function
@@ -499,132 +606,183 @@ class Fish():
             return my_index, i-2, self.T(i-1)-i+1,self.T(i)-(i+1)
     #Triangle formation map 
     def triangle_formation(self,nfish,linespace):
-        columns = ['X', 'Y', 'dist']
-        index= np.arange(nfish)
-        df= pd.DataFrame(index=index, columns=columns)
-        df= df.fillna(0.0)
-        for i,row in df.iterrows():
+        target_map = np.zeros((nfish, 3))
+        for i in range(nfish):
             my_index, my_row, rs, re = self.get_row_n2(i)
-            df.iloc[i]['X'] = my_row*linespace
-            df.iloc[i]['dist'] = my_index
+            target_map[i, 0] = my_row*linespace
+            target_map[i, 2] = my_index
             if(re-rs>0):
                 ys = np.linspace(-(re-rs)/2,(re-rs)/2,int(re-rs)+1)
-                df.iloc[i]['Y'] = ys[int(my_index-rs)]
-        df['X'] = -df['X']
-        return df
-    #returns the target formation
+                target_map[i, 1] = ys[int(my_index-rs)]
+        target_map[:, 0] = -target_map[:, 0]
+        return target_map
+    #returns the target formation. The maps are shared by all fish, see `FormationMaps`
     def mapped_formation_move(self,rel_pos,n_fish,map_type,linespace):
         if(map_type==0):
-            df = self.fibonacci_formation(n_fish,linespace)     
+            build = self.fibonacci_formation
         elif(map_type==1):
-            df = self.triangle_formation(n_fish,linespace)
-        return self.define_target(rel_pos, df)
+            build = self.triangle_formation
+        if(self.assignment == 'optimal'):
+            #One slot for every fish in view including myself
+            target_map = formation_maps.get(map_type, n_fish+1, linespace, build)
+            return self.assign_target(rel_pos, target_map)
+        target_map = formation_maps.get(map_type, n_fish, linespace, build)
+        return self.define_target(rel_pos, target_map)
     def nearest(self,target_map, neighbor_pos):
-        target_map['dist'] = np.sqrt( (target_map.X-neighbor_pos['X'])**2 + (target_map.Y-neighbor_pos['Y'])**2)
-        target_map.sort_values(['dist'],ascending =True)
-        return target_map.iloc[0]
+        """Store the distances to a position and return the first row
+
+        Arguments:
+            target_map {np.array} -- (K, 3) array of x, y, and distance. The
+                distances are overwritten in place.
+            neighbor_pos {np.array} -- Position with x and y first
+
+        Returns:
+            np.array -- View of the first row of `target_map`
+        """
+        target_map[:, 2] = np.sqrt( (target_map[:, 0]-neighbor_pos[0])**2 + (target_map[:, 1]-neighbor_pos[1])**2)
+        return target_map[0]
     #function returns the target point for my fish 
     def define_target(self,rel_pos,target_map):
         #Define Leader
         r = 1.5
-        tolerance = self.tolerance
-        df = pd.DataFrame.from_dict(rel_pos,orient = 'index', columns=['X', 'Y'])
-        df['dist'] = np.sqrt( (df.X)**2 + (df.Y)**2)
-        front_neighbors = df[df['X']>0]
-        front_neighbors = front_neighbors.sort_values(['X'],ascending =False)
-        rel_pos = df.sort_values(['dist'],ascending =True)
+        df = self.neighbor_array(rel_pos)
+        front_neighbors = df[df[:, 0]>0]
+        front_neighbors = front_neighbors[sort_order(front_neighbors[:, 0], ascending=False)]
+        rel_pos = df[sort_order(df[:, 2])]
         my_target = [0,0]
         #meaning I am the leader 
         if(self.fish_total_error >= self.tolerance):
             if(len(front_neighbors)==0):
-                if(len(df[df['dist']<=r])>0):
+                self.is_leader = True
+                if(np.any(df[:, 2]<=r)):
                     self.fish_total_error = 2*self.tolerance
                     return [0,0]
                 return [0,0]
-            elif(len(front_neighbors)>0):
-                leader = front_neighbors.iloc[0]
-                my_leader_x =leader['X']
-                my_leader_y = leader['Y']
-                target_map = target_map.sort_values(['X'],ascending =False)
-                #No one should try to get the leader for now
-                target_map.iloc[1:]
-                #Transpose target map
-                target_map['X'] += my_leader_x
-                target_map['Y'] += my_leader_y
-                target_map['dist'] = np.sqrt( (target_map.X)**2 + (target_map.Y)**2)
-                target_map = target_map.sort_values(['dist'],ascending =True)
-
-
-                if(len(target_map[target_map['dist']<0.5])>0 and len(rel_pos[rel_pos['dist']<=r])==0):
-                    self.fish_total_error = target_map.iloc[0]['dist']
-                    return [0,0]
-
-                me =  pd.DataFrame([[0, 0, 0]])
-                rel_pos.append(me)
-                my_target = [target_map.iloc[0]['X'],target_map.iloc[0]['Y']]
-                target_map = target_map.sort_values(['dist'],ascending =True)
-                #In this case I assign positions to map targets so that I avoid collision
-                for i, a in target_map.iterrows():
-                    b = self.nearest(rel_pos, a)
-                    if(b.X==0 and b.Y == 0):
-                        if(len(rel_pos[rel_pos['dist']<=r])>0):
-                            self.fish_total_error = a.dist + self.tolerance
-                        return [a.X,a.Y]
-                    c = self.nearest(target_map, b)
-                    if(a.X == c.X and a.Y == c.Y):
-                        rel_pos.drop(rel_pos.index[i]) 
-                        target_map.drop(target_map.index[i])
-                    elif(a.dist<= b.dist):
-                        self.fish_total_error = abs(a.dist)
-                        if(self.fish_total_error >= self.tolerance):
-                            self.fish_total_error = abs(a.dist)
-                            return [a.X, a.Y]
-                        else: 
-                            return [0,0]
-            else: 
-                self.fish_total_error = 0 
+            self.is_leader = False
+            leader = front_neighbors[0]
+            #Sorting copies the map, so the shared map is never modified
+            target_map = target_map[sort_order(target_map[:, 0], ascending=False)]
+            #Transpose target map
+            target_map[:, 0] += leader[0]
+            target_map[:, 1] += leader[1]
+            target_map[:, 2] = np.sqrt( (target_map[:, 0])**2 + (target_map[:, 1])**2)
+            target_map = target_map[sort_order(target_map[:, 2])]
+
+            if(np.any(target_map[:, 2]<0.5) and not np.any(rel_pos[:, 2]<=r)):
+                self.fish_total_error = target_map[0, 2]
                 return [0,0]
+
+            my_target = [target_map[0, 0],target_map[0, 1]]
+            target_map = target_map[sort_order(target_map[:, 2])]
+            #In this case I assign positions to map targets so that I avoid collision.
+            #Rows are views, so their distances follow the updates by nearest()
+            for a in target_map:
+                b = self.nearest(rel_pos, a)
+                if(b[0]==0 and b[1] == 0):
+                    if(np.any(rel_pos[:, 2]<=r)):
+                        self.fish_total_error = a[2] + self.tolerance
+                    return [a[0],a[1]]
+                c = self.nearest(target_map, b)
+                if(a[0] == c[0] and a[1] == c[1]):
+                    continue
+                elif(a[2]<= b[2]):
+                    self.fish_total_error = abs(a[2])
+                    if(self.fish_total_error >= self.tolerance):
+                        return [a[0], a[1]]
+                    else: 
+                        return [0,0]
         return my_target
+
+    def assign_target(self, rel_pos, target_map):
+        """Find the target point for my fish with an optimal assignment
+
+        Instead of claiming slots greedily like `define_target()`, all fish in
+        view, including myself, are assigned to the slots of the target map
+        with the Hungarian algorithm such that the total distance to the slots
+        is minimal. As every fish solves the same problem on a similar view,
+        fish rarely compete for a slot. Neighbors that were not perceived,
+        i.e., at [0,0], are left out. The assignment is reused while the
+        leader and the set of neighbors stay the same and no neighbor moved
+        by more than `assignment_tolerance` relative to the leader, which my
+        own moves do not change.
+
+        Arguments:
+            rel_pos {dict} -- Relative positions to all neighbors
+            target_map {np.array} -- (K, 3) array of x, y, and index of the
+                slots relative to the leader
+
+        Returns:
+            list -- Move direction as a 2D vector
+        """
+        r = 1.5
+        if(self.fish_total_error < self.tolerance):
+            return [0,0]
+
+        ids = [i for i in sorted(rel_pos) if np.any(rel_pos[i])]
+        positions = np.array([rel_pos[i] for i in ids], dtype=float).reshape(-1, 2)
+        ahead = positions[:, 0] > 0
+        if(not np.any(ahead)):
+            #meaning I am the leader
+            self.is_leader = True
+            self.last_assignment = None
+            if(np.any(np.sqrt(positions[:, 0]**2 + positions[:, 1]**2) <= r)):
+                self.fish_total_error = 2*self.tolerance
+            return [0,0]
+
+        self.is_leader = False
+        leader = np.flatnonzero(ahead)[sort_order(positions[ahead, 0], ascending=False)[0]]
+        formation = positions - positions[leader]
+        #Transpose target map
+        slots = target_map[:, :2] + positions[leader]
+
+        slot = None
+        if(self.last_assignment is not None):
+            last_ids, last_formation, last_leader, last_slot = self.last_assignment
+            if(last_ids == ids and last_leader == leader
+                    and np.all(np.abs(formation - last_formation) < self.assignment_tolerance)):
+                slot = last_slot
+
+        if(slot is None):
+            #I am the first row
+            fish = np.concatenate((np.zeros((1, 2)), positions))
+            rows, cols = linear_sum_assignment(cdist(fish, slots))
+            if(len(rows) == 0 or rows[0] != 0):
+                #There are more fish than slots and I did not get one
+                self.last_assignment = None
+                return [0,0]
+            slot = cols[0]
+            self.last_assignment = (ids, formation, leader, slot)
+
+        target = slots[slot]
+        self.fish_total_error = np.sqrt(target[0]**2 + target[1]**2)
+        if(self.fish_total_error >= self.tolerance):
+            return [target[0], target[1]]
+        return [0,0]
    
     #LOCAL FORMATIONS: 
     def visible_neighbors (self, my_neighbors):
-        """Returns a dataframe of neighbors that are visible to the fish depending on target formation.
+        """Returns the neighbors that are visible to the fish depending on target formation.
         Arguments:
-            rel_pos {dict} -- relative position of all neighbors 
-            orientation {} -- Orientation of the fish to detect visisble neighbors 
+            my_neighbors {np.array} -- (K, 3) array of x, y, and distance of
+                all neighbors
         Returns:
-            pandas.dataframe -- a dataframe of the neighbors of the fish that are needed for a certain formation
+            np.array -- x, y, and distance of the neighbors of the fish that are needed for a certain formation
         """
         # This part of the code  uses the orientation of the fish to detect which neighbors are seen in front. 
+        orientation= self.orientation 
+        orientation= [orientation[1], -orientation[0]] 
+        front = ((my_neighbors[:, 0] - orientation[0])*(orientation[0]) - (my_neighbors[:, 1])*(orientation[1]))
+        # Whole units count, i.e., neighbors less than one unit behind are still in front
+        neighbors_front = my_neighbors[np.trunc(front)>=0]
+        neighbors_front = neighbors_front[np.lexsort((neighbors_front[:, 0], neighbors_front[:, 2]))]
         if (self.formation_num == 0):
-            my_neighbors['front'] = 0
-            orientation= self.orientation 
-            orientation= [orientation[1], -orientation[0]] 
-            for i,row in my_neighbors.iterrows():
-                front_n= ((row.X - orientation[0])*(orientation[0]) - (row.Y)*(orientation[1]))
-                #front_n= np.cross([row.X-orientation[0],row.Y-orientation[1]], np.negative(orientation))
-                my_neighbors.at[i, 'front'] = front_n
-            neighbors_front =  my_neighbors[my_neighbors['front']>=0]
-            neighbors_front = neighbors_front.sort_values(['dist','X'], ascending =True )
-            if(len(neighbors_front)>=3):
-                return neighbors_front.iloc[:3]
-            else: 
-                return neighbors_front 
+            return neighbors_front[:3]
         elif (self.formation_num == 1):
-            orientation= self.orientation 
-            orientation= [orientation[1], -orientation[0]] 
-            my_neighbors['front'] = 0
-            for i,row in my_neighbors.iterrows():
-                front_n= ((row.X - orientation[0])*(orientation[0]) - (row.Y)*(orientation[1]))
-                #front_n= np.cross([row.X-orientation[0],row.Y-orientation[1]], np.negative(orientation))
-                my_neighbors.at[i, 'front'] = front_n
-            neighbors_front =  my_neighbors[my_neighbors['front']>=0]
-            neighbors_front = neighbors_front.sort_values(['dist','X'], ascending =True )
             if(len(neighbors_front)>=2):
-                neighbors_front = neighbors_front.drop_duplicates()
-                return neighbors_front.iloc[:2]
-            else: 
-                return neighbors_front
+                # The second reference must differ from the first
+                distinct = np.any(neighbors_front[1:] != neighbors_front[0], axis=1)
+                neighbors_front = np.concatenate((neighbors_front[:1], neighbors_front[1:][distinct][:1]))
+            return neighbors_front
             
         return neighbors_front 
    
@@ -785,133 +943,157 @@ class Fish():
                 return [m1 , m2]
         return [[0,0]]
 
+    def close_neighbors(self, radius_neighbors, local_tolerance):
+        """Find neighbors that are too close to the fish along x or y
+
+        Arguments:
+            radius_neighbors {np.array} -- (K, 3) array of x, y, and distance
+                of the neighbors around the fish
+            local_tolerance {float} -- Ideal space between floats.
+
+        Returns:
+            np.array -- Boolean mask of the neighbors that are too close
+        """
+        x = np.round(radius_neighbors[:, 0], 1)
+        y = np.round(radius_neighbors[:, 1], 1)
+        return ((-local_tolerance <= x) & (x <= local_tolerance)) | ((-local_tolerance <= y) & (y <= local_tolerance))
+
+    def move_error(self, radius_neighbors, moves, local_tolerance):
+        """Distance to the closest of the possible moves that is still available
+
+        All moves are checked against all neighbors at once, see
+        `valid_moves()`.
+
+        Arguments:
+            radius_neighbors {np.array} -- (K, 3) array of x, y, and distance
+                of the neighbors around the fish
+            moves {list} -- Possible moves
+            local_tolerance {float} -- Ideal space between floats.
+
+        Returns:
+            float -- Distance to the closest available move or 10 if no move
+                is available
+        """
+        moves = np.asarray(moves, dtype=float).reshape(-1, 2)
+        distances = np.sqrt( (moves[:, 0])**2 + (moves[:, 1])**2)
+        return np.min(np.where(self.valid_moves(radius_neighbors, moves, local_tolerance), distances, 10))
+
     #This function returns the fitness level of the fish f_i given the target formation
     def fitnes(self, my_neighbors,linespace, radius_neighbors):
         total_square_error = 0 
         local_tolerance = 0.25
+        close = self.close_neighbors(radius_neighbors, local_tolerance)
         if (self.formation_num == 0):
-            x_target = linespace*np.sin(np.deg2rad(120))
-            y_target = linespace*np.cos(np.deg2rad(120))
             if(len(my_neighbors)==0):
                 #If I have no reference neighbors (I am the first of the school) I still have to check whether neighbors are very close. 
                 #If one or more neighbors are too close, then my fitness level will be increased so I move backwards and then can 
-                #make another move. 
-                for i,row in radius_neighbors.iterrows():
-                    if((-local_tolerance <= round(row.X,1) <= local_tolerance) or  (-local_tolerance <= round(row.Y,1) <= local_tolerance)):
-                        return 3*self.tolerance
-                    else: 
-                        return 0 
+                #make another move. Only the closest neighbor in the list is checked.
+                if(len(radius_neighbors)>0):
+                    return 3*self.tolerance if close[0] else 0
             elif(len(my_neighbors)==1):
-                neighbor = [my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']]
+                neighbor = [my_neighbors[0, 0],my_neighbors[0, 1]]
                 moves = self.possible_moves(linespace, self.formation_num, neighbor, [0,0], [0,0])
-                distances = []
-                for move in moves: 
-                    if(self.valid_move(radius_neighbors, move,local_tolerance)):
-                        d = np.sqrt( (move[0])**2 + (move[1])**2)
-                        distances.append(d)
-                    else: 
-                        distances.append(10)
-                total_square_error += np.min(distances)
-                for i,row in radius_neighbors.iterrows():
-                    if((-local_tolerance <= round(row.X,1) <= local_tolerance) or  (-local_tolerance <= round(row.Y,1) <= local_tolerance)):
-                        total_square_error += 3*self.tolerance
+                total_square_error += self.move_error(radius_neighbors, moves, local_tolerance)
+                total_square_error += np.count_nonzero(close)*3*self.tolerance
             elif(len(my_neighbors)==2):
-                n1 = np.nan_to_num([my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']])
-                n2 = np.nan_to_num([my_neighbors.iloc[1]['X'],my_neighbors.iloc[1]['Y']])
+                n1 = np.nan_to_num(my_neighbors[0, :2])
+                n2 = np.nan_to_num(my_neighbors[1, :2])
                 moves = self.possible_moves(linespace, self.formation_num, n1, n2, [0,0])
-                distances = []
-                for move in moves: 
-                    if(self.valid_move(radius_neighbors, move, local_tolerance)):
-                        d = np.sqrt( (move[0])**2 + (move[1])**2)
-                        distances.append(d)
-                    else: 
-                        distances.append(10)
-                total_square_error += np.min(distances)
-                for i,row in radius_neighbors.iterrows():
-                    if((-local_tolerance <= round(row.X,1) <= local_tolerance) or  (-local_tolerance <= round(row.Y,1) <= local_tolerance)):
-                        total_square_error += self.tolerance
+                total_square_error += self.move_error(radius_neighbors, moves, local_tolerance)
+                total_square_error += np.count_nonzero(close)*self.tolerance
             elif(len(my_neighbors)>2):
-                n1 = np.nan_to_num([my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']])
-                n2 = np.nan_to_num([my_neighbors.iloc[1]['X'],my_neighbors.iloc[1]['Y']])
-                n3 = np.nan_to_num([my_neighbors.iloc[2]['X'],my_neighbors.iloc[2]['Y']])
+                n1 = np.nan_to_num(my_neighbors[0, :2])
+                n2 = np.nan_to_num(my_neighbors[1, :2])
+                n3 = np.nan_to_num(my_neighbors[2, :2])
                 moves = self.possible_moves(linespace, self.formation_num, n1, n2, n3)
-                distances = []
-                for move in moves: 
-                    if(self.valid_move(radius_neighbors, move, local_tolerance)):
-                        d = np.sqrt( (move[0])**2 + (move[1])**2)
-                        distances.append(d)
-                    else: 
-                        distances.append(10)
-                total_square_error += np.min(distances)
-                for i,row in radius_neighbors.iterrows():
-                    if((-local_tolerance <= round(row.X,1) <= local_tolerance) or  (-local_tolerance <= round(row.Y,1) <= local_tolerance)):
-                        total_square_error += self.tolerance
-                    else: 
-                        total_square_error += 0
+                total_square_error += self.move_error(radius_neighbors, moves, local_tolerance)
+                total_square_error += np.count_nonzero(close)*self.tolerance
         elif (self.formation_num == 1):
-            x_target = linespace*np.sin(np.deg2rad(60))
-            y_target = linespace*np.cos(np.deg2rad(60))
             if(len(my_neighbors)==0):
                 #If I have no reference neighbors (I am the first of the school) I still have to check whether neighbors are very close. 
                 #If one or more neighbors are too close, then my fitness level will be increased so I move backwards and then can 
-                #make another move. 
-                for i,row in radius_neighbors.iterrows():
-                    if((-local_tolerance <= round(row.X,1) <= local_tolerance) or  (-local_tolerance <= round(row.Y,1) <= local_tolerance)):
-                        return self.tolerance
-                    else: 
-                        return 0 
+                #make another move. Only the closest neighbor in the list is checked.
+                if(len(radius_neighbors)>0):
+                    return self.tolerance if close[0] else 0
             elif(len(my_neighbors)==1):
-                neighbor = [my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']]
+                neighbor = [my_neighbors[0, 0],my_neighbors[0, 1]]
                 moves = self.possible_moves(linespace, self.formation_num, neighbor, [0,0])
-                distances = []
-                for move in moves: 
-                    if(self.valid_move(radius_neighbors, move,local_tolerance)):
-                        d = np.sqrt( (move[0])**2 + (move[1])**2)
-                        distances.append(d)
-                    else: 
-                        distances.append(10)
-                total_square_error += np.min(distances)
-                for i,row in radius_neighbors.iterrows():
-                    if((-local_tolerance <= round(row.X,1) <= local_tolerance) or  (-local_tolerance <= round(row.Y,1) <= local_tolerance)):
-                        total_square_error += 3*self.tolerance
-                    else: 
-                        total_square_error += 0
+                total_square_error += self.move_error(radius_neighbors, moves, local_tolerance)
+                total_square_error += np.count_nonzero(close)*3*self.tolerance
             elif(len(my_neighbors)>1):
-                n1 = np.nan_to_num([my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']])
-                n2 = np.nan_to_num([my_neighbors.iloc[1]['X'],my_neighbors.iloc[1]['Y']])
+                n1 = np.nan_to_num(my_neighbors[0, :2])
+                n2 = np.nan_to_num(my_neighbors[1, :2])
                 moves = self.possible_moves(linespace, self.formation_num, n1, n2)
-                distances = []
-                for move in moves: 
-                    if(self.valid_move(radius_neighbors, move, local_tolerance)):
-                        d = np.sqrt( (move[0])**2 + (move[1])**2)
-                        distances.append(d)
-                    else: 
-                        distances.append(10)
-                total_square_error += np.min(distances)
-                for i,row in radius_neighbors.iterrows():
-                    if((-local_tolerance <= round(row.X,1) <= local_tolerance) or  (-local_tolerance <= round(row.Y,1) <= local_tolerance)):
-                        total_square_error += self.tolerance
+                total_square_error += self.move_error(radius_neighbors, moves, local_tolerance)
+                total_square_error += np.count_nonzero(close)*self.tolerance
         return total_square_error
 
     def valid_move(self, radius_neighbors, intended_move, local_tolerance):
         """Checks whether intended move of my fish is available, a.k.a. no other fish are already in that position
         Arguments:
-            radius neighbors pandas df  -- df to all of the neighbors in the formation visible to the fish  
+            radius_neighbors {np.array} -- (K, 3) array of x, y, and distance
+                of all of the neighbors in the formation visible to the fish
             intended_move [0,0] -- Array of intended location for this fish  
             local tolerance {float}  -- Ideal space between floats.
         Returns:
             True/False whether there is a spot available of nor 
         """
-        intended_move= np.round(np.nan_to_num(intended_move),1)
-        if(radius_neighbors.apply(lambda row: (((intended_move[0]-local_tolerance<=row.X <= intended_move[0]+ local_tolerance)
-            &(( intended_move[1]- local_tolerance <=row.Y <= intended_move[1]+local_tolerance)))), axis=1).sum()>0):
-            return False
-        else: 
-            if(np.count_nonzero(intended_move)>0):
-                return True
-            else:
-                False
-    
+        return self.valid_moves(radius_neighbors, np.reshape(intended_move, (1, 2)), local_tolerance)[0]
+
+    def valid_moves(self, radius_neighbors, intended_moves, local_tolerance):
+        """Checks for many intended moves at once whether they are available
+
+        Compares all moves with all neighbors in one (moves x neighbors)
+        computation.
+
+        Arguments:
+            radius_neighbors {np.array} -- (K, 3) array of x, y, and distance
+                of all of the neighbors in the formation visible to the fish
+            intended_moves {np.array} -- (M, 2) array of intended locations
+            local_tolerance {float} -- Ideal space between floats.
+
+        Returns:
+            np.array -- (M,) boolean array whether each spot is available
+        """
+        intended_moves = np.round(np.nan_to_num(np.asarray(intended_moves, dtype=float)),1)
+        x = radius_neighbors[np.newaxis, :, 0]
+        y = radius_neighbors[np.newaxis, :, 1]
+        move_x = intended_moves[:, 0, np.newaxis]
+        move_y = intended_moves[:, 1, np.newaxis]
+        taken = ((move_x-local_tolerance<=x) & (x<= move_x+ local_tolerance)
+            & (move_y- local_tolerance <=y) & (y <= move_y+local_tolerance))
+        return ~np.any(taken, axis=1) & np.any(intended_moves != 0, axis=1)
+
+    def free_move(self, moves, radius_neighbors):
+        """Pick the closest of the possible moves that no neighbor is closer to
+
+        Moves are tried from closest to farthest, each against the next closest
+        neighbor.
+
+        Arguments:
+            moves {list} -- Possible moves
+            radius_neighbors {np.array} -- (K, 3) array of x, y, and distance
+                of the remaining neighbors around the fish
+
+        Returns:
+            list -- The move or [0,0] if no move is available
+        """
+        possible_moves = np.zeros((len(moves), 3))
+        possible_moves[:, :2] = moves
+        possible_moves[:, 2] = np.sqrt( (possible_moves[:, 0])**2 + (possible_moves[:, 1])**2)
+        possible_moves = possible_moves[sort_order(possible_moves[:, 2])]
+        while(len(possible_moves)>0 ):
+            move = possible_moves[0]
+            if(len(radius_neighbors)>0):
+                b = self.nearest(radius_neighbors, move)
+                if(b[2] <= move[2]):
+                    return [move[0], move[1]]
+                else: 
+                    possible_moves = possible_moves[1:]
+                    radius_neighbors = radius_neighbors[1:]
+            else: 
+                return [move[0], move[1]]
+        return [0,0]
 
     def triangle_local(self,rel_pos,linespace,orientation):
         """Connect in a triangle formation with my nearest neighbors.
@@ -924,19 +1106,13 @@ class Fish():
         """
         #Target values 
         #Given the linespace (hypothemuse)  calculate the ideal x and y distances  
-        #Trasnform into dataframe and filter through the ones that are only 3 linespaces away
-        df = pd.DataFrame.from_dict(rel_pos,orient = 'index', columns=['X', 'Y'])
-        df['dist'] = np.sqrt( (df.X)**2 + (df.Y)**2)
-        radius_neighbors = df[df['dist']<= 10*linespace]
-        radius_neighbors = radius_neighbors.sort_values(['dist'], ascending= True)
-        
-        local_tolerance = .25 
-        x_target = linespace*np.sin(np.deg2rad(60))
-        y_target = linespace*np.cos(np.deg2rad(60))
+        #Filter through the neighbors that are only 10 linespaces away
+        df = self.neighbor_array(rel_pos)
+        radius_neighbors = df[df[:, 2]<= 10*linespace]
+        radius_neighbors = radius_neighbors[sort_order(radius_neighbors[:, 2])]
 
         #These are the neighbors I will take into consideration to choose my position
         my_neighbors = self.visible_neighbors(radius_neighbors)
-        move = [0,0]
         #First we are going to check we indeed have access to the required number of neighbors
         self.fish_total_error = abs(self.fitnes(my_neighbors, linespace,radius_neighbors))
         if(self.fish_total_error <= self.tolerance):
@@ -947,52 +1123,18 @@ class Fish():
             elif(len(my_neighbors)==1):
                     #drop your reference neighbor from the radious neighbors
                     radius_neighbors = radius_neighbors[1:]
-                    n1 = [my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']]
-                    possible_moves = pd.DataFrame(self.possible_moves(linespace, self.formation_num,n1, [0,0]), columns=['X', 'Y'])
-                    possible_moves['dist'] = np.sqrt( (possible_moves.X)**2 + (possible_moves.Y)**2)
-                    possible_moves = possible_moves.sort_values(['dist'],ascending =True)
-                    while(possible_moves.shape[0]>0 ):
-                        move = possible_moves.iloc[0]
-                        if(radius_neighbors.shape[0]>0):
-                            b = self.nearest(radius_neighbors, move)
-                            if(b.dist <= move.dist):
-                                return [move['X'], move['Y']]
-                            else: 
-                                possible_moves.iloc[1:]
-                                radius_neighbors.iloc[1:]
-                        else: 
-                            return [move['X'], move['Y']]
-                    return [0,0]
+                    n1 = [my_neighbors[0, 0],my_neighbors[0, 1]]
+                    return self.free_move(self.possible_moves(linespace, self.formation_num,n1, [0,0]), radius_neighbors)
 
                 #1)get all of your possible moves given your reference neighbors
             else: 
                 radius_neighbors = radius_neighbors[2:]
-                n1 = [my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']]
-                n2 = [my_neighbors.iloc[1]['X'],my_neighbors.iloc[1]['Y']]
-                possible_moves = pd.DataFrame(self.possible_moves(linespace, self.formation_num,n1, n1), columns=['X', 'Y'])
-                possible_moves['dist'] = np.sqrt( (possible_moves.X)**2 + (possible_moves.Y)**2)
-                possible_moves = possible_moves.sort_values(['dist'],ascending =True)
-                while(possible_moves.shape[0]>0 ):
-                    move = possible_moves.iloc[0]
-                    if(radius_neighbors.shape[0]>0):
-                        b = self.nearest(radius_neighbors, move)
-                        if(b.dist <= move.dist):
-                            return [move['X'], move['Y']]
-                        else: 
-                            possible_moves.iloc[1:]
-                            radius_neighbors.iloc[1:]
-                    else: 
-                        return [move['X'], move['Y']]
-                return [0,0]
+                n1 = [my_neighbors[0, 0],my_neighbors[0, 1]]
+                return self.free_move(self.possible_moves(linespace, self.formation_num,n1, n1), radius_neighbors)
             
     def trigonal_planar(self,rel_pos,linespace,orientation):
-        df = pd.DataFrame.from_dict(rel_pos,orient = 'index', columns=['X', 'Y'])
-        df['dist'] = np.sqrt( (df.X)**2 + (df.Y)**2)
-        radius_neighbors = df[df['dist']<= 10*linespace]
-        
-        local_tolerance = .25 
-        x_target = linespace*np.sin(np.deg2rad(120))
-        y_target = linespace*np.cos(np.deg2rad(120))
+        df = self.neighbor_array(rel_pos)
+        radius_neighbors = df[df[:, 2]<= 10*linespace]
 
         #These are the neighbors I will take into consideration to choose my position
         my_neighbors = self.visible_neighbors(radius_neighbors)
@@ -1005,63 +1147,19 @@ class Fish():
             elif(len(my_neighbors)==1):
                     #drop your reference neighbor from the radious neighbors
                     radius_neighbors = radius_neighbors[1:]
-                    n1 = [my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']]
-                    possible_moves = pd.DataFrame(self.possible_moves(linespace, self.formation_num,n1, [0,0],[0,0]), columns=['X', 'Y'])
-                    possible_moves['dist'] = np.sqrt( (possible_moves.X)**2 + (possible_moves.Y)**2)
-                    possible_moves = possible_moves.sort_values(['dist'],ascending =True)
-                    while(possible_moves.shape[0] >0 ):
-                        move = possible_moves.iloc[0]
-                        if(radius_neighbors.shape[0]>0):
-                            b = self.nearest(radius_neighbors, move)
-                            if(b.dist <= move.dist):
-                                return [move['X'], move['Y']]
-                            else: 
-                                possible_moves.iloc[1:]
-                                radius_neighbors.iloc[1:]
-                        else: 
-                            return [move['X'], move['Y']]
-                    return [0,0]
+                    n1 = [my_neighbors[0, 0],my_neighbors[0, 1]]
+                    return self.free_move(self.possible_moves(linespace, self.formation_num,n1, [0,0],[0,0]), radius_neighbors)
 
             #1)get all of your possible moves given your reference neighbors
             elif(len(my_neighbors)==2): 
                 radius_neighbors = radius_neighbors[2:]
-                n1 = [my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']]
-                n2 = [my_neighbors.iloc[1]['X'],my_neighbors.iloc[1]['Y']]
-                possible_moves = pd.DataFrame(self.possible_moves(linespace, self.formation_num,n1, n1, [0,0]), columns=['X', 'Y'])
-                possible_moves['dist'] = np.sqrt( (possible_moves.X)**2 + (possible_moves.Y)**2)
-                possible_moves = possible_moves.sort_values(['dist'],ascending =True)
-                while(len(possible_moves) >0 ):
-                    move = possible_moves.iloc[0]
-                    if(radius_neighbors.shape[0]>0):
-                        b = self.nearest(radius_neighbors, move)
-                        if(b.dist <= move.dist):
-                            return [move['X'], move['Y']]
-                        else: 
-                            possible_moves.iloc[1:]
-                            radius_neighbors.iloc[1:]
-                    else: 
-                        return [move['X'], move['Y']]
-                return [0,0]
+                n1 = [my_neighbors[0, 0],my_neighbors[0, 1]]
+                return self.free_move(self.possible_moves(linespace, self.formation_num,n1, n1, [0,0]), radius_neighbors)
             else: 
                 radius_neighbors = radius_neighbors[2:]
-                n1 = [my_neighbors.iloc[0]['X'],my_neighbors.iloc[0]['Y']]
-                n2 = [my_neighbors.iloc[1]['X'],my_neighbors.iloc[1]['Y']]
-                n3 = [my_neighbors.iloc[2]['X'],my_neighbors.iloc[2]['Y']]
-                possible_moves = pd.DataFrame(self.possible_moves(linespace, self.formation_num,n1, n1,n3), columns=['X', 'Y'])
-                possible_moves['dist'] = np.sqrt( (possible_moves.X)**2 + (possible_moves.Y)**2)
-                possible_moves = possible_moves.sort_values(['dist'],ascending =True)
-                while(len(possible_moves) >0 ):
-                    move = possible_moves.iloc[0]
-                    if(radius_neighbors.shape[0]>0):
-                        b = self.nearest(radius_neighbors, move)
-                        if(b.dist <= move.dist):
-                            return [move['X'], move['Y']]
-                        else: 
-                            possible_moves.iloc[1:]
-                            radius_neighbors.iloc[1:]
-                    else: 
-                        return [move['X'], move['Y']]
-                return [0,0]
+                n1 = [my_neighbors[0, 0],my_neighbors[0, 1]]
+                n3 = [my_neighbors[2, 0],my_neighbors[2, 1]]
+                return self.free_move(self.possible_moves(linespace, self.formation_num,n1, n1,n3), radius_neighbors)
 
 
     def move(self, neighbors, rel_pos):
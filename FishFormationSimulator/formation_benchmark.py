@@ -0,0 +1,237 @@
+"""Convergence and cost of the four formations for growing schools.
+
+Every formation runs noise-free with the lock-step engine, see
+`utils.step_simulation()`, from random initial positions at the same density
+for every school size. A run stops once the formation error of every fish is
+within the tolerance, see `CONVERGENCE`, or after `max_ticks` clock ticks.
+For each formation and school size the benchmark reports the ticks to
+convergence, statistics of the final `fish_total_error` of the judged fish,
+and the wall time per tick, and writes all results to a JSON report.
+
+Run from the FishFormationSimulator directory:
+
+    python formation_benchmark.py
+"""
+import contextlib
+import io
+import json
+import math
+import time
+import numpy as np
+
+from channel import Channel
+from environment import Environment
+from interaction import Interaction
+from observer import Observer
+from utils import generate_distortion, generate_fish, step_simulation
+
+FORMATIONS = {
+    0: 'trigonal planar',
+    1: 'local triangle',
+    2: 'global Fibonacci',
+    3: 'global triangle'
+}
+
+SIZES = [10, 50, 200, 1000]
+
+# Ideal space between fish, see `Fish.move()`
+LINESPACE = 2
+
+CONVERGENCE = (
+    'Every fish has a fish_total_error within the tolerance. In the global '
+    'formations the leaders, i.e., fish that found no neighbor ahead in their '
+    'last move, see `Fish.is_leader`, are exempt, as they never update their '
+    'error. The final error statistics cover the same fish.'
+)
+
+
+def run_formation(
+    formation_num,
+    num_fish,
+    max_ticks=100,
+    tolerance=0.1,
+    assignment='greedy',
+    seed=0
+):
+    """Run one formation until it converges
+
+    The fish start in a square that grows with the school, so every fish has
+    about the same number of neighbors, and perceive neighbors within the 10
+    line spaces the local formations consider. See `CONVERGENCE` for when a
+    formation has converged.
+
+    Arguments:
+        formation_num {int} -- Formation, see `FORMATIONS`
+        num_fish {int} -- Number of fish
+
+    Keyword Arguments:
+        max_ticks {int} -- Maximum number of clock ticks (default: {100})
+        tolerance {float} -- Formation error up to which a fish is in place
+            (default: {0.1})
+        assignment {str} -- Slot assignment of the global formations, see
+            `Fish.assign_target()` (default: {'greedy'})
+        seed {int} -- Seed of the initial positions (default: {0})
+
+    Returns:
+        dict -- Results of the run
+    """
+    np.random.seed(seed)
+
+    conn_thres = 10 * LINESPACE
+    spread = 2 * LINESPACE * math.sqrt(num_fish)
+    arena_size = int(math.ceil(spread)) * 3
+    fish_pos = spread * np.random.rand(num_fish, 2) + (arena_size - spread) / 2
+
+    environment = Environment(
+        node_pos=fish_pos,
+        arena_size=[arena_size, arena_size],
+        distortion=generate_distortion(type='none', n=arena_size),
+        prob_type='binary',
+        noise_magnitude=0,
+        conn_thres=conn_thres,
+        spatial_index='grid'
+    )
+    interaction = Interaction(environment)
+    channel = Channel(environment)
+
+    fish = generate_fish(
+        n=num_fish,
+        channel=channel,
+        interaction=interaction,
+        orientation=np.array([0., 1.]),
+        tolerance=tolerance,
+        formation_num=formation_num,
+        fish_total_error=1,
+        lim_neighbors=[0, math.inf],
+        fish_max_speeds=1,
+        clock_freqs=1,
+        assignment=assignment
+    )
+    channel.set_nodes(fish)
+
+    observer = Observer(
+        fish=fish,
+        environment=environment,
+        channel=channel,
+        record={'total_error': 1}
+    )
+
+    tick_times = []
+    converged_at = None
+    errors = np.array([f.fish_total_error for f in fish], dtype=float)
+    # The observer prints the total error on every tick
+    with contextlib.redirect_stdout(io.StringIO()):
+        for tick in range(max_ticks):
+            start = time.time()
+            step_simulation(fish, observer)
+            tick_times.append(time.time() - start)
+
+            errors = np.array([f.fish_total_error for f in fish], dtype=float)
+            if formation_num in (2, 3):
+                errors = errors[~np.array([f.is_leader for f in fish], dtype=bool)]
+            # Fish only start to move in their third tick
+            if tick > 1 and np.all(errors <= tolerance):
+                converged_at = tick + 1
+                break
+
+        observer.stop()
+
+    return {
+        'formation_num': formation_num,
+        'formation': FORMATIONS[formation_num],
+        'num_fish': num_fish,
+        'assignment': assignment,
+        'seed': seed,
+        'ticks': len(tick_times),
+        'converged': converged_at is not None,
+        'ticks_to_convergence': converged_at,
+        'num_judged': int(errors.size),
+        'final_error': {
+            'mean': float(np.nanmean(errors)),
+            'median': float(np.nanmedian(errors)),
+            'max': float(np.nanmax(errors)),
+            'total': float(np.nansum(errors)),
+            'num_nan': int(np.count_nonzero(np.isnan(errors))),
+            'num_in_place': int(np.count_nonzero(errors <= tolerance))
+        },
+        # No tick times if max_ticks is 0
+        'tick_time': {
+            'mean': float(np.mean(tick_times)) if tick_times else math.nan,
+            'median': float(np.median(tick_times)) if tick_times else math.nan,
+            'max': float(np.max(tick_times)) if tick_times else math.nan
+        },
+        'wall_time': float(np.sum(tick_times)),
+        'total_error': [float(e) for e in observer.total_error]
+    }
+
+
+def benchmark(
+    sizes=SIZES,
+    formations=FORMATIONS,
+    max_ticks=100,
+    tolerance=0.1,
+    assignment='greedy',
+    seed=0,
+    report='formation_benchmark.json'
+):
+    """Run all formations for all school sizes and write a report
+
+    Keyword Arguments:
+        sizes {list} -- Numbers of fish (default: {[10, 50, 200, 1000]})
+        formations {list} -- Formations to run (default: {all})
+        max_ticks {int} -- Maximum number of clock ticks per run
+            (default: {100})
+        tolerance {float} -- Formation error up to which a fish is in place
+            (default: {0.1})
+        assignment {str} -- Slot assignment of the global formations
+            (default: {'greedy'})
+        seed {int} -- Seed of the initial positions (default: {0})
+        report {str} -- JSON file to write the results to. Nothing is
+            written if None. (default: {'formation_benchmark.json'})
+
+    Returns:
+        list -- Results of all runs, see `run_formation()`
+    """
+    print('{:<18} {:>6} {:>6} {:>10} {:>10} {:>10} {:>14}'.format(
+        'formation', 'fish', 'ticks', 'converged', 'mean err', 'max err',
+        'ms per tick'))
+
+    results = []
+    for formation_num in formations:
+        for num_fish in sizes:
+            result = run_formation(
+                formation_num,
+                num_fish,
+                max_ticks=max_ticks,
+                tolerance=tolerance,
+                assignment=assignment,
+                seed=seed
+            )
+            results.append(result)
+
+            print('{:<18} {:>6} {:>6} {:>10} {:>10.3f} {:>10.3f} {:>14.1f}'.format(
+                result['formation'],
+                num_fish,
+                result['ticks'],
+                'yes' if result['converged'] else 'no',
+                result['final_error']['mean'],
+                result['final_error']['max'],
+                1000 * result['tick_time']['mean']
+            ))
+
+    if report is not None:
+        with open(report, 'w') as f:
+            json.dump({
+                'max_ticks': max_ticks,
+                'tolerance': tolerance,
+                'assignment': assignment,
+                'seed': seed,
+                'convergence': CONVERGENCE,
+                'runs': results
+            }, f, indent=2)
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,177 @@
+import numpy as np
+
+
+class Recorder():
+    """Records time series into preallocated NumPy arrays
+
+    Every field stores one sample of a fixed shape per tick, e.g., the (N, 2)
+    positions of all fish, in a (T, ...) array. The arrays grow geometrically,
+    so recording a sample costs one slice copy and the recorded series can be
+    read as array views without any conversion. Optionally every sample is
+    also streamed to a `TrajectoryStore` on disk. A spec selects the fields to
+    record and how often, so nothing else is stored.
+    """
+
+    def __init__(self, capacity=64, max_history=None, store=None, spec=None):
+        """Create an empty recorder
+
+        Keyword Arguments:
+            capacity {int} -- Initial number of samples per field
+                (default: {64})
+            max_history {int} -- Keep only the most recent samples of every
+                field. Keep all samples if None. (default: {None})
+            store {TrajectoryStore} -- Store to stream all samples to
+                (default: {None})
+            spec {dict} -- Names of the fields to record mapped to the number
+                of ticks between two samples, e.g., `{'pos': 10}`. Record all
+                fields at every tick if None. (default: {None})
+        """
+        self.capacity = max(1, capacity)
+        self.max_history = max_history
+        self.store = store
+        self.spec = spec
+        self.fields = {}
+        self.buffers = {}
+        self.sizes = {}
+        self.starts = {}
+
+    def __contains__(self, name):
+        return name in self.buffers
+
+    def add(self, name, shape=(), dtype=float):
+        """Add a field
+
+        Arguments:
+            name {str} -- Name of the field
+
+        Keyword Arguments:
+            shape {tuple} -- Shape of one sample (default: {()})
+            dtype {type} -- Data type of the samples (default: {float})
+        """
+        self.fields[name] = (tuple(shape), np.dtype(dtype))
+
+        if self.spec is not None and name not in self.spec:
+            return
+
+        capacity = self.capacity
+        if self.max_history is not None:
+            capacity = min(capacity, 2 * self.max_history)
+
+        self.buffers[name] = np.zeros((capacity,) + tuple(shape), dtype=dtype)
+        self.sizes[name] = 0
+        self.starts[name] = 0
+
+        if self.store is not None:
+            every = 1 if self.spec is None else self.spec[name]
+            self.store.add(name, shape, dtype, every=every)
+
+    def check_spec(self):
+        """Check that the spec only selects added fields
+
+        Raises:
+            ValueError -- If the spec selects an unknown field
+        """
+        if self.spec is None:
+            return
+
+        unknown = sorted(set(self.spec) - set(self.fields))
+        if unknown:
+            raise ValueError('Unknown fields {}. Choose from {}'.format(
+                unknown, sorted(self.fields)
+            ))
+
+    def records(self, name, tick):
+        """Check whether a field is recorded at a tick
+
+        Arguments:
+            name {str} -- Name of the field
+            tick {int} -- Clock tick
+
+        Returns:
+            bool -- `True` if a sample of the field should be appended
+        """
+        if name not in self.buffers:
+            return False
+
+        if self.spec is None:
+            return True
+
+        return tick % self.spec[name] == 0
+
+    def append(self, name, sample):
+        """Record one sample of a field
+
+        Arguments:
+            name {str} -- Name of the field
+            sample {np.array} -- Sample of the shape of the field
+        """
+        buffer = self.buffers[name]
+        end = self.starts[name] + self.sizes[name]
+
+        if end == buffer.shape[0]:
+            if self.max_history is not None and self.sizes[name] >= self.max_history:
+                # Move the most recent samples to the front
+                start = end - self.max_history + 1
+                buffer[:self.max_history - 1] = buffer[start:end]
+                self.starts[name] = 0
+                self.sizes[name] = self.max_history - 1
+                end = self.max_history - 1
+            else:
+                capacity = 2 * buffer.shape[0]
+                if self.max_history is not None:
+                    capacity = min(capacity, 2 * self.max_history)
+                grown = np.zeros((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+                grown[:end] = buffer[:end]
+                self.buffers[name] = buffer = grown
+
+        buffer[end] = sample
+
+        if self.store is not None:
+            self.store.append(name, buffer[end])
+
+        if self.max_history is not None and self.sizes[name] == self.max_history:
+            self.starts[name] += 1
+        else:
+            self.sizes[name] += 1
+
+    def get(self, name):
+        """All recorded samples of a field
+
+        Arguments:
+            name {str} -- Name of the field
+
+        Returns:
+            np.array -- View of shape (T, ...) with the samples in order.
+                Empty if the field is not recorded.
+        """
+        if name not in self.buffers:
+            shape, dtype = self.fields[name]
+            return np.zeros((0,) + shape, dtype=dtype)
+
+        start = self.starts[name]
+        return self.buffers[name][start:start + self.sizes[name]]
+
+    def size(self, name):
+        """Number of recorded samples of a field
+
+        Arguments:
+            name {str} -- Name of the field
+
+        Returns:
+            int -- Number of samples
+        """
+        return self.sizes.get(name, 0)
+
+    def flush(self):
+        """Write all samples not yet on disk to the store
+        """
+        if self.store is not None:
+            self.store.flush()
+
+    def nbytes(self):
+        """Memory of all preallocated arrays
+
+        Returns:
+            int -- Number of bytes
+        """
+        return sum(buffer.nbytes for buffer in self.buffers.values())
@@ -0,0 +1,173 @@
+import itertools
+import math
+import numpy as np
+
+from scipy.spatial import cKDTree
+
+
+class GridIndex():
+    """Uniform grid hash of node positions
+
+    Every node is hashed into a cell of a regular grid. A radius query only
+    checks the nodes in the cells overlapping the query ball, so its cost scales
+    with the local density of nodes rather than with their total number. Moving
+    a node only rehashes that node.
+    """
+
+    def __init__(self, cell_size, metric='euclidean'):
+        """Create an empty grid
+
+        Arguments:
+            cell_size {float} -- Edge length of a grid cell, e.g. the
+                connection threshold
+
+        Keyword Arguments:
+            metric {str} -- Distance metric of radius queries, 'euclidean' or
+                'cityblock' (default: {'euclidean'})
+        """
+        self.cell_size = cell_size
+        self.p = 1 if metric == 'cityblock' else 2
+        self.node_pos = None
+        self.cells = {}
+        self.node_cells = []
+
+    def cell(self, pos):
+        """Grid cell of a position
+
+        Arguments:
+            pos {np.array} -- Position
+
+        Returns:
+            tuple -- Integer cell coordinates
+        """
+        return tuple(np.floor(pos / self.cell_size).astype(int))
+
+    def build(self, node_pos):
+        """Hash all nodes
+
+        Arguments:
+            node_pos {np.array} -- Positions of all nodes. The index keeps a
+                reference and reads moved nodes from it.
+        """
+        self.node_pos = node_pos
+        self.cells = {}
+        self.node_cells = []
+
+        for i in range(node_pos.shape[0]):
+            cell = self.cell(node_pos[i])
+            self.cells.setdefault(cell, set()).add(i)
+            self.node_cells.append(cell)
+
+    def move(self, index):
+        """Rehash a node after it moved
+
+        Arguments:
+            index {int} -- Index of the moved node
+        """
+        cell = self.cell(self.node_pos[index])
+        old_cell = self.node_cells[index]
+
+        if cell == old_cell:
+            return
+
+        self.cells[old_cell].discard(index)
+        if not self.cells[old_cell]:
+            del self.cells[old_cell]
+        self.cells.setdefault(cell, set()).add(index)
+        self.node_cells[index] = cell
+
+    def query(self, pos, radius):
+        """Find all nodes within a radius
+
+        Arguments:
+            pos {np.array} -- Center of the query ball
+            radius {float} -- Radius of the query ball
+
+        Returns:
+            np.array -- Sorted indices of all nodes within the radius
+        """
+        low = self.cell(pos - radius)
+        high = self.cell(pos + radius)
+        num_cells = np.prod([h - l + 1 for l, h in zip(low, high)])
+
+        if num_cells > len(self.cells):
+            # Large radius, checking the occupied cells is cheaper
+            cells = [c for c in self.cells if all(
+                l <= x <= h for x, l, h in zip(c, low, high)
+            )]
+        else:
+            cells = itertools.product(*[
+                range(l, h + 1) for l, h in zip(low, high)
+            ])
+
+        candidates = []
+        for cell in cells:
+            candidates.extend(self.cells.get(cell, ()))
+
+        if not candidates:
+            return np.zeros((0,), dtype=int)
+
+        candidates = np.array(candidates)
+        dist = np.linalg.norm(self.node_pos[candidates] - pos, ord=self.p, axis=1)
+
+        return np.sort(candidates[dist <= radius])
+
+
+class KDTreeIndex():
+    """k-d tree of node positions
+
+    Moving a node only marks the tree as outdated. The tree is rebuilt on the
+    next radius query, so many moves followed by many queries, as in one clock
+    tick, cost a single rebuild.
+    """
+
+    def __init__(self, metric='euclidean'):
+        """Create an empty tree
+
+        Keyword Arguments:
+            metric {str} -- Distance metric of radius queries, 'euclidean' or
+                'cityblock' (default: {'euclidean'})
+        """
+        self.p = 1 if metric == 'cityblock' else 2
+        self.node_pos = None
+        self.tree = None
+        self.outdated = True
+
+    def build(self, node_pos):
+        """Build the tree of all nodes
+
+        Arguments:
+            node_pos {np.array} -- Positions of all nodes. The index keeps a
+                reference and reads moved nodes from it.
+        """
+        self.node_pos = node_pos
+        self.tree = cKDTree(node_pos)
+        self.outdated = False
+
+    def move(self, index):
+        """Mark the tree as outdated after a node moved
+
+        Arguments:
+            index {int} -- Index of the moved node
+        """
+        self.outdated = True
+
+    def query(self, pos, radius):
+        """Find all nodes within a radius
+
+        Arguments:
+            pos {np.array} -- Center of the query ball
+            radius {float} -- Radius of the query ball
+
+        Returns:
+            np.array -- Sorted indices of all nodes within the radius
+        """
+        if self.outdated:
+            self.build(self.node_pos)
+
+        if math.isinf(radius):
+            return np.arange(self.node_pos.shape[0])
+
+        return np.sort(np.array(
+            self.tree.query_ball_point(pos, radius, p=self.p), dtype=int
+        ))
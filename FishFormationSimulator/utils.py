@@ -66,7 +66,8 @@ def generate_fish(
     fish_max_speeds=None,
     clock_freqs=None,
     verbose=False,
-    names=None
+    names=None,
+    assignment='greedy'
 ):
     """Generate some fish
 
@@ -79,6 +80,8 @@ def generate_fish(
         fish_max_speeds {float|list} -- List of max speeds
         clock_freqs {int|list} -- List of clock speeds
         names {list} -- List of names for your fish
+        assignment {str} -- How fish are assigned to the slots of global
+            formations, `greedy` or `optimal` (default: {'greedy'})
     """
 
     if neighbor_weights is None:
@@ -113,6 +116,7 @@ def generate_fish(
             neighbor_weight=neighbor_weights[i],
             fish_max_speed=fish_max_speeds[i],
             clock_freq=clock_freqs[i],
+            assignment=assignment,
             verbose=verbose,
             name=names[i]
         ))
@@ -269,3 +273,44 @@ def run_simulation(
     # Ciao stops run time
     threading.Timer(run_time, stop).start()
     observer_thread.join()
+
+
+def step_simulation(fish, observer):
+    """Advance all fish and the observer by exactly one clock tick.
+
+    Every fish first evaluates its queue and moves, then the observer records
+    the swarm and broadcasts due instructions, and finally every fish
+    communicates. This is the same order the threaded simulation aims for but
+    without any sleeping.
+
+    Arguments:
+        fish {list} -- List of fish instances
+        observer {Observer} -- Observer instance
+    """
+    for f in fish:
+        f.eval()
+
+    observer.eval()
+
+    for f in fish:
+        f.communicate()
+
+
+def run_lockstep_simulation(fish, observer, num_ticks=10):
+    """Run the simulation synchronously for a fixed number of clock ticks.
+
+    Unlike `run_simulation()` no threads are started and nothing sleeps, so the
+    simulation runs as fast as the CPU allows and always covers exactly
+    `num_ticks` clock cycles.
+
+    Arguments:
+        fish {list} -- List of fish instances
+        observer {Observer} -- Observer instance
+
+    Keyword Arguments:
+        num_ticks {int} -- Total number of clock ticks (default: {10})
+    """
+    for _ in range(num_ticks):
+        step_simulation(fish, observer)
+
+    observer.stop()
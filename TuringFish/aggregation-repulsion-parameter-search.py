@@ -108,7 +108,9 @@ def run_trial(run_time, num_fish, initial_spread, k_ar, alpha):
     )
     channel.set_nodes(fish)
 
-    observer = Observer(fish=fish, environment=environment, channel=channel)
+    # Only record what the parameter search evaluates
+    observer = Observer(fish=fish, environment=environment, channel=channel,
+        record={'pos': 1, 'avg_dist': 1, 'avg_speed': 1})
     run_simulation(fish=fish, observer=observer, run_time=run_time,
         dark=True, white_axis=False, no_legend=True, no_star=False,
         show_dist_plot=True, plot=False)
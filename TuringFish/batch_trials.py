@@ -0,0 +1,182 @@
+import numpy as np
+
+from replica_fish import sum_neighbors, unpack_weights
+
+
+def delight_velocities(rel_pos, k_ar=0.003, alpha=40):
+    """Velocity contributions of neighbors for ideal fish
+
+    Batched version of `Fish.attraction_repulsion()`.
+
+    Arguments:
+        rel_pos {np.array} -- Relative positions of shape (P, N, 2) to the
+            neighbors
+
+    Keyword Arguments:
+        k_ar {float} -- Weighting of neighbors (default: {0.003})
+        alpha {number} -- Goal distance from neighbors (default: {40})
+
+    Returns:
+        np.array -- Velocity contributions of shape (P, N, 2)
+    """
+    dist = np.maximum(0.00001, np.linalg.norm(rel_pos, axis=-1, keepdims=True))
+    diff_alpha = dist - alpha
+
+    return k_ar * np.sign(diff_alpha) * np.power(diff_alpha, 2) * rel_pos / dist
+
+
+def pairwise_distances(pos):
+    """Distances between all fish of every trial
+
+    Arguments:
+        pos {np.array} -- Positions of shape (P, N, 2)
+
+    Returns:
+        np.array -- Distances of shape (P, N, N)
+    """
+    return np.linalg.norm(pos[:, np.newaxis, :, :] - pos[:, :, np.newaxis, :], axis=-1)
+
+
+def run_trials(
+    weights,
+    num_fish=25,
+    num_ticks=13,
+    conn_thres=100,
+    k_ar=0.003,
+    alpha=40,
+    fish_max_speed=9,
+    arena_size=300,
+    initial_spread=20,
+    fish_pos=None,
+    rng=None,
+    clock_freq=1
+):
+    """Run many Turing Learning trials at once and collect their features
+
+    Every trial simulates a school of either ideal or replica fish, like
+    `turing_learning.run_full_test()` with binary connectivity and without
+    noise, but all trials are stepped together as arrays of shape
+    (trials, fish, ...), without threads or sleeping. As there, two clock
+    ticks are simulated before the `num_ticks` recorded ones, because fish
+    only start to move in their third tick. Within a clock tick the
+    fish move one after another in order of their ids, as in the lock-step
+    engine, while all trials and all neighbors are evaluated at once.
+
+    Arguments:
+        weights {list} -- Weights of the replica fish of every trial, or None
+            for a trial with ideal fish
+
+    Keyword Arguments:
+        num_fish {int} -- Number of fish per trial (default: {25})
+        num_ticks {int} -- Number of recorded clock ticks per trial
+            (default: {13})
+        conn_thres {float} -- Distance at which fish can no longer detect
+            other fish (default: {100})
+        k_ar {float} -- Weighting of neighbors of ideal fish
+            (default: {0.003})
+        alpha {number} -- Goal distance from neighbors of ideal fish
+            (default: {40})
+        fish_max_speed {number} -- Max speed of each fish (default: {9})
+        arena_size {number} -- Size of the arena. The fish start around its
+            center. (default: {300})
+        initial_spread {number} -- Size of the square the fish start in
+            (default: {20})
+        fish_pos {np.array} -- Initial positions of shape (trials, fish, 2).
+            Random if None. (default: {None})
+        rng {np.random.Generator} -- Random number generator for the initial
+            positions. Use the global NumPy random state if None.
+            (default: {None})
+        clock_freq {number} -- Clock frequency of the fish (default: {1})
+
+    Returns:
+        np.array -- Linear speed, angular speed, and distances to all other
+            fish of every fish in every trial, shape
+            (trials, fish, num_ticks, fish + 1)
+    """
+    num_trials = len(weights)
+    clock_speed = 1 / clock_freq
+
+    real = np.array([w is None for w in weights])
+    layers = None
+    if not real.all():
+        layers = unpack_weights(
+            [np.reshape(w, (21,)) for w in weights if w is not None]
+        )
+
+    if fish_pos is None:
+        arena_center = arena_size / 2.0
+        rand = np.random.random_sample if rng is None else rng.random
+        fish_pos = initial_spread * rand((num_trials, num_fish, 2)) + \
+            arena_center - initial_spread / 2.0
+    pos = np.array(fish_pos, dtype=float)
+
+    orientation = np.zeros((num_trials, num_fish))
+    # Neighbors whose pings each fish received in the last tick
+    heard = np.zeros((num_trials, num_fish, num_fish), dtype=bool)
+    others = ~np.eye(num_fish, dtype=bool)
+
+    features = np.zeros((num_trials, num_fish, num_ticks, num_fish + 1))
+
+    last_x = None
+    last_orientation = None
+
+    for clock in range(num_ticks + 2):
+        if clock > 1:
+            for i in range(num_fish):
+                rel_pos = pos - pos[:, i:i + 1, :]
+
+                # Only fish within reach are perceived, others appear at [0,0]
+                dist = np.linalg.norm(rel_pos, axis=-1)
+                rel_pos[dist > conn_thres] = 0
+
+                new_velocity = np.zeros((num_trials, 2))
+                if real.any():
+                    new_velocity[real] = np.sum(
+                        delight_velocities(rel_pos[real], k_ar=k_ar, alpha=alpha) *
+                        heard[real, i, :, np.newaxis],
+                        axis=1
+                    )
+                if layers is not None:
+                    new_velocity[~real] = sum_neighbors(
+                        rel_pos[~real],
+                        heard[~real, i],
+                        layers,
+                        fish_max_speed=fish_max_speed
+                    )
+
+                # Cap the length of the move
+                magnitude = np.linalg.norm(new_velocity, axis=-1, keepdims=True)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    final_move = np.where(
+                        magnitude > 0,
+                        new_velocity / magnitude * np.minimum(magnitude, fish_max_speed),
+                        new_velocity
+                    )
+
+                    # set orientation in direction of velocity
+                    orientation[:, i] = np.where(
+                        final_move[:, 0] == 0,
+                        (np.pi / 2) * np.sign(final_move[:, 1]),
+                        np.arctan(final_move[:, 1] / final_move[:, 0])
+                    )
+
+                pos[:, i] += final_move
+
+        # The observer records speeds and neighbor distances
+        dist = pairwise_distances(pos)
+
+        if clock > 1:
+            t = clock - 2
+            features[:, :, t, 0] = np.abs(last_x - pos[:, :, 0]) / clock_speed / 9
+            features[:, :, t, 1] = (orientation - last_orientation) / clock_speed / np.pi
+            features[:, :, t, 2:] = dist[:, others].reshape(
+                num_trials, num_fish, num_fish - 1
+            )
+
+        last_x = pos[:, :, 0].copy()
+        last_orientation = orientation.copy()
+
+        # Every fish pings all other fish within reach
+        heard = (dist <= conn_thres) & others
+
+    return features
@@ -1,5 +1,4 @@
 import numpy as np
-import random
 
 from eventcodes import INFO_INTERNAL
 
@@ -29,6 +28,8 @@ class Channel():
             nodes {list} -- List of node instances
         """
         self.nodes = nodes
+        self.node_ids = {node.id: node for node in nodes}
+        self.ids = np.array([node.id for node in nodes], dtype=int)
 
     def intercept(self, observer):
         """Let an observer intercept all messages.
@@ -46,9 +47,10 @@ class Channel():
     def transmit(self, source, event, pos=np.zeros((2,)), is_observer=False):
         """Transmit a broadcasted event to node instances
 
-        This method gets the probability of connectedness between two nodes
-        from the environment and adds the events on the node instances given
-        that probability.
+        This method gets the probabilities of connectedness between the source
+        and all other nodes from the environment at once, draws all receptions
+        with one random call, and adds the event on the receiving node
+        instances.
 
         Arguments:
             source {*} -- Node instance
@@ -58,34 +60,36 @@ class Channel():
         if self.observer:
             self.observer.transmissions.put(event)
 
-        for target in self.nodes:
-            if source == target:
-                # Sorry no monologs
-                continue
-
-            source_log = ''
-
-            if is_observer:
-                dist = np.sqrt(
-                    np.sum(
-                        (self.environment.node_pos[target.id] - pos) ** 2
-                    )
-                )
-                prob = self.environment.prob_dist(dist)
-                source_log = 'observer'
+        if is_observer:
+            ids = self.ids
+            dist = np.sqrt(
+                np.sum((self.environment.node_pos[ids] - pos) ** 2, axis=1)
+            )
+            source_log = 'observer'
+        else:
+            if (
+                self.environment.index is not None and
+                self.environment.prob_type != 'sigmoid'
+            ):
+                # Nodes beyond conn_thres can not receive anything
+                ids = self.environment.neighbors(source.id)
             else:
-                prob = self.environment.prob(source.id, target.id)
-                source_log = source.id
+                # Sorry no monologs
+                ids = self.ids[self.ids != source.id]
+            dist = self.environment.distance_all(source.id, ids)
+            source_log = source.id
 
-            success = random.random() <= prob
+        prob = self.environment.prob_dist_all(dist)
+        success = np.random.rand(ids.size) <= prob
 
-            if success:
-                target.queue.put((event, pos))
+        for i in ids[success]:
+            self.node_ids[i].queue.put((event, pos))
 
-            if self.verbose:
+        if self.verbose:
+            for i, target_success, target_prob in zip(ids, success, prob):
                 print(
                     'Channel: transmitted event from {} to {}: {} '
                     '(prob: {:0.2f})'.format(
-                        source_log, target.id, success, prob
+                        source_log, i, target_success, target_prob
                     )
                 )
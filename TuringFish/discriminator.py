@@ -1,6 +1,89 @@
 import math
 import numpy as np
 
+
+def logistic_sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def unpack_weights(weights):
+    """Split weights into the layers and radii of the classifier network
+
+    Arguments:
+        weights {np.array} -- 48 weights, optionally with leading dimensions,
+            e.g., (C, 48) for C different classifiers
+
+    Returns:
+        tuple -- Input to hidden (..., 2, 5), hidden bias (..., 1, 5), hidden
+            to hidden (..., 5, 5), hidden to output (..., 5, 1), output bias
+            (..., 1, 1) weights, and both radii (...)
+    """
+    weights = np.asarray(weights, dtype=float)
+    shape = weights.shape[:-1]
+
+    return (
+        np.reshape(weights[..., :10], shape + (2, 5)),
+        np.reshape(weights[..., 10:15], shape + (1, 5)),
+        np.reshape(weights[..., 15:40], shape + (5, 5)),
+        np.reshape(weights[..., 40:45], shape + (5, 1)),
+        np.reshape(weights[..., 45:46], shape + (1, 1)),
+        weights[..., 46],
+        weights[..., 47]
+    )
+
+
+def classify_all(classifier_weights, all_sim_data):
+    """Classify every fish of every trial with every classifier at once
+
+    Batched version of `Classifier.classify_all_models()`. The recurrent
+    network is evaluated for all classifiers, trials, and fish together as
+    arrays of shape (C, M, F, ...), stepping only over time.
+
+    Arguments:
+        classifier_weights {np.array} -- Weights of shape (C, 48), one row per
+            classifier
+        all_sim_data {np.array} -- Data of shape (M, F, T, 2 + num_fish) of M
+            trials with F fish each, see `turing_learning.test_simulation()`
+
+    Returns:
+        np.array -- Classification of shape (C, M, F). Real fish are 1,
+            replicas are 0.
+    """
+    weights = np.reshape(np.asarray(classifier_weights, dtype=float), (-1, 48))
+    (
+        input_to_hidden,
+        bias_hidden,
+        hidden_to_hidden,
+        hidden_to_output,
+        bias_output,
+        radius1,
+        radius2
+    ) = unpack_weights(weights[:, np.newaxis])
+
+    radius1 = np.reshape(radius1, (-1, 1, 1, 1))
+    radius2 = np.reshape(radius2, (-1, 1, 1, 1))
+
+    hidden = None
+    for t in range(all_sim_data.shape[2]):
+        # Number of neighbors within both radii
+        distances = all_sim_data[np.newaxis, :, :, t, 4:]
+        inputs = np.stack((
+            (distances > radius1).sum(axis=-1),
+            (distances > radius2).sum(axis=-1)
+        ), axis=-1).astype(float)
+
+        if hidden is None:
+            hidden = np.matmul(inputs, input_to_hidden) + bias_hidden
+        else:
+            hidden = np.matmul(inputs, input_to_hidden) + bias_hidden + \
+                np.matmul(hidden, hidden_to_hidden)
+        hidden = logistic_sigmoid(hidden)
+
+    output = logistic_sigmoid(np.matmul(hidden, hidden_to_output) + bias_output)
+
+    return np.where(output[..., 0] < 0.5, 0, 1)
+
+
 class Classifier():
     """This class creates a discriminator to classify real and false agents
     """
@@ -12,6 +95,7 @@ class Classifier():
     ):
 
         self.id = id
+        self.weights = weights
         # Elman NN with 2 input neurons, 1 hidden layer with 5 neurons, and 1 outputs
         # The input is the fish's number of neihgbors within 2 radii
         # Distance to consider a neigbor is a learned parameter.
@@ -70,8 +154,7 @@ class Classifier():
 
             output: 1 x num_fish matrix, with each value classifying model/non model
         """
-        outputs = [self.run_network(fish) for fish in models]
-        return np.reshape(outputs, (len(outputs)))
+        return classify_all([self.weights], models[np.newaxis])[0, 0]
 
     def classify_all_models(self, all_sim_data):
         """
@@ -81,5 +164,4 @@ class Classifier():
 
         """
 
-        outputs = [self.classify_models(trial) for trial in all_sim_data]
-        return np.stack(outputs, axis = 0)
+        return classify_all([self.weights], all_sim_data)[0]
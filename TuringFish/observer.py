@@ -9,6 +9,8 @@ from eventcodes import (
     INFO_EXTERNAL, INFO_INTERNAL, START_HOP_COUNT, HOP_COUNT,
     START_LEADER_ELECTION, LEADER_ELECTION
 )
+from recorder import Recorder
+from store import TrajectoryStore
 
 # 21 categorical colors. Used for plotting
 colors = [
@@ -47,7 +49,11 @@ class Observer():
         neighbor_distance = 100,
         clock_freq=1,
         fish_pos=None,
-        verbose=False
+        verbose=False,
+        max_history=None,
+        store=None,
+        record=None,
+        record_fish=None
     ):
         """Create a god-like observer!
 
@@ -63,6 +69,22 @@ class Observer():
                 fish (default: {1})
             fish_pos {np.array} -- Initial fish positions (default: {None})
             verbose {bool} -- If `true` log out some stuff (default: {False})
+            max_history {int} -- Keep only the most recent samples of every
+                recorded series, so memory stays bounded however long the
+                simulation runs. Keep all samples if None.
+                (default: {None})
+            store {str} -- Directory to stream all recorded series to. The
+                series can be loaded lazily with `TrajectoryStore.open()`
+                even for runs that do not fit into memory. (default: {None})
+            record {dict} -- Fields to record, 'pos', 'o', 'lin_speed',
+                'ang_speed', 'neighbor_distances', 'avg_dist', 'avg_speed',
+                or 'messages', mapped to the number of ticks between two
+                samples, e.g., `{'avg_dist': 1, 'avg_speed': 1}` for a
+                parameter search. Record all fields at every tick if None.
+                (default: {None})
+            record_fish {list} -- Ids of the fish whose positions,
+                orientations, speeds, and neighbor distances are recorded.
+                Record all fish if None. (default: {None})
         """
         self.environment = environment
         self.fish = fish
@@ -75,29 +97,57 @@ class Observer():
         self.clock = 0
 
         self.num_nodes = self.environment.node_pos.shape[0]
-        self.x = []
-        self.y = []
-        self.o = []
-        self.neighbor_distances = []
-        self.lin_speed = []
-        self.ang_speed = []
         self.c = []
         self.status = []
-        self.avg_dist = []
-        self.avg_speed = []
         self.reset = False
 
+        self.record_fish = None
+        num_recorded = self.num_nodes
+        if record_fish is not None:
+            self.record_fish = np.array(record_fish, dtype=int)
+            num_recorded = self.record_fish.size
+
+        # Positions and orientations of the recorded fish, their speeds and
+        # neighbor distances for Turing Learning, the swarm averages, and the
+        # number of intercepted messages, one slice per tick
+        if store is not None:
+            store = TrajectoryStore(
+                store,
+                num_nodes=self.num_nodes,
+                clock_freq=clock_freq,
+                node_ids=self.record_fish
+            )
+        self.recorder = Recorder(
+            max_history=max_history, store=store, spec=record
+        )
+        self.recorder.add('pos', (num_recorded, 2))
+        self.recorder.add('o', (num_recorded,))
+        self.recorder.add('lin_speed', (num_recorded,))
+        self.recorder.add('ang_speed', (num_recorded,))
+        # Mask of the other fish of every recorded fish, selects the neighbor
+        # distances from rows of the distance matrix
+        self.other_fish = np.ones((num_recorded, self.num_nodes), dtype=bool)
+        self.other_fish[
+            np.arange(num_recorded),
+            np.arange(self.num_nodes) if record_fish is None else self.record_fish
+        ] = False
+        self.recorder.add(
+            'neighbor_distances', (num_recorded, self.num_nodes - 1)
+        )
+        self.recorder.add('avg_dist')
+        self.recorder.add('avg_speed')
+        self.recorder.add('messages', dtype=int)
+        self.recorder.check_spec()
+        self.num_messages = 0
+
+        # Positions and orientations of the last tick to calculate speeds
+        self.last_pos = None
+        self.last_orient = None
+
         self.node_colors = []
         for i in range(self.num_nodes):
             ii = i % 20
             self.node_colors.append(colors[ii])
-            self.x.append([])
-            self.y.append([])
-            self.o.append([])
-            self.neighbor_distances.append([])
-            self.lin_speed.append([])
-            self.ang_speed.append([])
-
             self.status.append([])
 
         self.is_started = False
@@ -162,6 +212,112 @@ class Observer():
         if fish_id is not None:
             self.object = self.environment.node_pos[fish_id]
 
+    def per_fish(self, samples):
+        """Arrange recorded samples by fish
+
+        Arguments:
+            samples {np.array} -- Samples of shape (T, n, ...) of the
+                recorded fish
+
+        Returns:
+            np.array -- Array of shape (N, T, ...), a view if all fish are
+                recorded. Rows of fish that are not recorded are NaN.
+        """
+        samples = np.moveaxis(samples, 1, 0)
+        if self.record_fish is None:
+            return samples
+
+        series = np.full((self.num_nodes,) + samples.shape[1:], np.nan)
+        series[self.record_fish] = samples
+
+        return series
+
+    @property
+    def x(self):
+        """Recorded x positions
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('pos')[:, :, 0])
+
+    @property
+    def y(self):
+        """Recorded y positions
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('pos')[:, :, 1])
+
+    @property
+    def o(self):
+        """Recorded orientations
+
+        Returns:
+            np.array -- Array of shape (N, T), one row per fish
+        """
+        return self.per_fish(self.recorder.get('o'))
+
+    @property
+    def lin_speed(self):
+        """Recorded linear speeds, normalized by the max speed. Starts at
+        the third tick.
+
+        Returns:
+            np.array -- Array of shape (N, T - 2), one row per fish
+        """
+        return self.per_fish(self.recorder.get('lin_speed'))
+
+    @property
+    def ang_speed(self):
+        """Recorded angular speeds, normalized by pi. Starts at the third
+        tick.
+
+        Returns:
+            np.array -- Array of shape (N, T - 2), one row per fish
+        """
+        return self.per_fish(self.recorder.get('ang_speed'))
+
+    @property
+    def neighbor_distances(self):
+        """Recorded distances to all other fish. Starts at the third tick.
+
+        Returns:
+            np.array -- Array of shape (N, T - 2, N - 1), one matrix per
+                fish
+        """
+        return self.per_fish(self.recorder.get('neighbor_distances'))
+
+    @property
+    def avg_dist(self):
+        """Recorded average distance between neighbors, for ticks in which
+        any fish had neighbors
+
+        Returns:
+            np.array -- View of shape (T',)
+        """
+        return self.recorder.get('avg_dist')
+
+    @property
+    def avg_speed(self):
+        """Recorded average speed, for ticks in which any fish had
+        neighbors
+
+        Returns:
+            np.array -- View of shape (T',)
+        """
+        return self.recorder.get('avg_speed')
+
+    @property
+    def messages(self):
+        """Recorded number of intercepted messages per tick
+
+        Returns:
+            np.array -- View of shape (T,)
+        """
+        return self.recorder.get('messages')
+
     def start(self):
         """Start the process
 
@@ -176,6 +332,7 @@ class Observer():
         This sets `is_started` to false.
         """
         self.is_started = False
+        self.recorder.flush()
 
         if self.track_hop_count:
             self.study_data[0].append(self.track_hop_count_num_events)
@@ -192,10 +349,11 @@ class Observer():
             )
 
     def run(self):
-        """Run the process recursively
+        """Run the process
 
-        This method simulates the fish and calls `eval` on every clock tick as
-        long as the fish `is_started`.
+        This method calls `eval` on every clock tick in a loop as long as the
+        observer `is_started`. Alternatively, leave the observer stopped and
+        let `step_simulation()` call `eval` once per tick.
         """
 
         while self.is_started:
@@ -243,6 +401,7 @@ class Observer():
 
             if self.reset and self.fish_pos is not None:
                 self.environment.node_pos = np.copy(self.fish_pos)
+                self.environment.update_distance()
 
             _, event, fish_id, pos, fish_all = self.instructions.get()
             if fish_id is not None:
@@ -331,9 +490,11 @@ class Observer():
         """Check intercepted transmission from the channel
         """
         not_saw_info = True
+        self.num_messages = 0
 
         while not self.transmissions.empty():
             event = self.transmissions.get()
+            self.num_messages += 1
 
             if event.opcode == INFO_INTERNAL:
                 not_saw_info = False
@@ -362,15 +523,18 @@ class Observer():
     def get_neighbor_distances(self, fish_id):
         # For Turing Learning, track neighbor distances
         # (all of them)
-        distances = []
-        for i in range(self.num_nodes):
-            if i != fish_id:
-                distances.append(self.environment.neighbor_distance(fish_id, i))
-        return distances
+        others = np.flatnonzero(np.arange(self.num_nodes) != fish_id)
+
+        return self.environment.distance_all(fish_id, others)
 
     def eval(self):
         """Save the position and connectivity status of the fish.
+
+        First commits the moves of the last clock tick to the environment, so
+        deferred distances are updated once per tick in the threaded as well
+        as the lock-step simulation.
         """
+        self.environment.commit_moves()
 
         self.check_transmissions()
         self.check_instructions()
@@ -379,36 +543,42 @@ class Observer():
         num_neighbor_pairs = 0
         total_speed = 0
 
-        for i in range(self.num_nodes):
-            # Tracking x, y, and orientation is useful both for
-            # visualization and learning
-            self.x[i].append(self.environment.node_pos[i, 0])
-            self.y[i].append(self.environment.node_pos[i, 1])
-            self.o[i].append(self.fish[i].orientation)
-
-            # also collect and calculate linear and angular speed
-            if len(self.x[i]) > 2:
-                prev_x = self.x[i][-2]
-                curr_x = self.x[i][-1]
-
-                prev_y = self.y[i][-2]
-                curr_y = self.y[i][-1]
-
-                prev_orient = self.o[i][-2]
-                curr_orient = self.o[i][-1]
-
-                # normalize by max speed, assume 9
-                speed = np.linalg.norm( \
-                                        np.array(prev_x, prev_y) -  \
-                                        np.array(curr_x, curr_y)) \
-                                        / self.clock_speed
-                self.lin_speed[i].append(speed / 9)
-                ang_speed = (curr_orient - prev_orient) / self.clock_speed
-                self.ang_speed[i].append(ang_speed / (np.pi))
-                # collect neighbor distances here too so the matrix is the correct length
-                self.neighbor_distances[i].append(self.get_neighbor_distances(i))
+        # Tracking x, y, and orientation is useful both for visualization
+        # and learning
+        fish_ids = slice(None) if self.record_fish is None else self.record_fish
+        pos = self.environment.node_pos[:, :2]
+        orient = np.array([fish.orientation for fish in self.fish], dtype=float)
+
+        if self.recorder.records('pos', self.clock):
+            self.recorder.append('pos', pos[fish_ids])
+
+        if self.recorder.records('o', self.clock):
+            self.recorder.append('o', orient[fish_ids])
+
+        # also collect and calculate linear and angular speed
+        if self.clock >= 2:
+            if self.recorder.records('lin_speed', self.clock):
+                # normalize by max speed, assume 9. Only the x displacement
+                # enters the speed, as the learned models expect.
+                speed = np.abs(self.last_pos[:, 0] - pos[:, 0]) / self.clock_speed
+                self.recorder.append('lin_speed', speed[fish_ids] / 9)
+
+            if self.recorder.records('ang_speed', self.clock):
+                ang_speed = (orient - self.last_orient) / self.clock_speed
+                self.recorder.append('ang_speed', ang_speed[fish_ids] / (np.pi))
+
+            # collect neighbor distances here too so the matrix is the correct length
+            if self.recorder.records('neighbor_distances', self.clock):
+                dist = self.environment.distance_matrix(self.record_fish)
+                self.recorder.append(
+                    'neighbor_distances',
+                    dist[self.other_fish].reshape(self.other_fish.shape[0], -1)
+                )
 
+        self.last_pos = pos.copy()
+        self.last_orient = orient
 
+        for i in range(self.num_nodes):
             n = len(self.fish[i].neighbors)
 
             neighbor_distances += sum(self.fish[i].neighbor_spacing)
@@ -416,8 +586,17 @@ class Observer():
             if self.fish[i].speed != None:
                 total_speed += self.fish[i].speed
         if num_neighbor_pairs > 0:
-            self.avg_dist.append(neighbor_distances / num_neighbor_pairs)
-            self.avg_speed.append(total_speed / self.num_nodes)
+            if self.recorder.records('avg_dist', self.clock):
+                self.recorder.append(
+                    'avg_dist', neighbor_distances / num_neighbor_pairs
+                )
+            if self.recorder.records('avg_speed', self.clock):
+                self.recorder.append(
+                    'avg_speed', total_speed / self.num_nodes
+                )
+
+        if self.recorder.records('messages', self.clock):
+            self.recorder.append('messages', self.num_messages)
         self.clock += 1
 
     def plot(
@@ -444,22 +623,28 @@ class Observer():
                 alpha=0.5
             )
 
+        x, y = self.x, self.y
+
         for i in range(self.num_nodes):
+            if not np.isfinite(x[i]).any():
+                # Fish was not recorded
+                continue
+
             c = self.node_colors[i]
             if i != 0 and not i % 20 and dark:
                 c = [1.0, 1.0, 1.0, 1.0]
 
             plt.plot(
-                self.x[i],
-                self.y[i],
+                x[i],
+                y[i],
                 c=c,
                 linewidth=2.0,
                 alpha=0.4
             )
 
             plt.scatter(
-                self.x[i],
-                self.y[i],
+                x[i],
+                y[i],
                 marker='o',
                 c = c,
                 s= 10,
@@ -467,8 +652,8 @@ class Observer():
             )
 
             plt.scatter(
-                self.x[i][0],
-                self.y[i][0],
+                x[i][0],
+                y[i][0],
                 c=c,
                 marker='>',
                 s=200,
@@ -477,11 +662,15 @@ class Observer():
 
         # draw final position on top of other elements
         for i in range(self.num_nodes):
+            if not np.isfinite(x[i]).any():
+                # Fish was not recorded
+                continue
+
             c = self.node_colors[i]
 
             plt.scatter(
-                self.x[i][-1],
-                self.y[i][-1],
+                x[i][-1],
+                y[i][-1],
                 c=c,
                 marker='s',
                 s=200,
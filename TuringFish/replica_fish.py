@@ -14,6 +14,104 @@ from eventcodes import (
 )
 
 
+def logistic_sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def vector_norm(x):
+    """Lengths of many vectors, computed like `np.linalg.norm()` of each one
+
+    Arguments:
+        x {np.array} -- Vectors of shape (..., D)
+
+    Returns:
+        np.array -- Lengths of shape (..., 1)
+    """
+    return np.sqrt(np.matmul(x[..., np.newaxis, :], x[..., :, np.newaxis])[..., 0])
+
+
+def unpack_weights(weights):
+    """Split weights into the layers of the replica fish neural network
+
+    Arguments:
+        weights {np.array} -- 21 weights, optionally with leading dimensions,
+            e.g., (P, 21) for P different models
+
+    Returns:
+        tuple -- Input to hidden (..., 2, 3), hidden bias (..., 1, 3), hidden
+            to output (..., 3, 3), and output bias (..., 1, 3) weights
+    """
+    weights = np.asarray(weights, dtype=float)
+    shape = weights.shape[:-1]
+
+    return (
+        np.reshape(weights[..., :6], shape + (2, 3)),
+        np.reshape(weights[..., 6:9], shape + (1, 3)),
+        np.reshape(weights[..., 9:18], shape + (3, 3)),
+        np.reshape(weights[..., 18:21], shape + (1, 3))
+    )
+
+
+def weight_neighbors(rel_pos, layers, fish_max_speed=9):
+    """Velocity contributions of many neighbors at once
+
+    Evaluates the neural network of `ReplicaFish.weight_neighbor()` for all
+    relative positions with one matrix multiplication per layer.
+
+    Arguments:
+        rel_pos {np.array} -- Relative positions of shape (..., K, 2), e.g.,
+            (F, K, 2) for K neighbors of F fish
+        layers {tuple} -- Network weights, see `unpack_weights()`. Leading
+            dimensions broadcast against those of `rel_pos`.
+
+    Keyword Arguments:
+        fish_max_speed {number} -- Max speed of each fish (default: {9})
+
+    Returns:
+        np.array -- Velocity contributions of shape (..., K, 2)
+    """
+    input_to_hidden, bias_hidden, hidden_to_output, bias_output = layers
+
+    hidden = logistic_sigmoid(
+        np.matmul(rel_pos / 100, input_to_hidden) + bias_hidden
+    )
+    output = logistic_sigmoid(
+        np.matmul(hidden, hidden_to_output) + bias_output
+    )
+    output += np.array([-0.5, -0.5, 0])
+
+    direction = output[..., :2]
+    direction_magnitude = vector_norm(direction)
+
+    # scale speed output by fish max speed
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(
+            direction_magnitude > 0,
+            (direction / direction_magnitude) * output[..., 2:] * fish_max_speed,
+            direction
+        )
+
+
+def sum_neighbors(rel_pos, neighbors, layers, fish_max_speed=9):
+    """Summed velocity contributions of the neighbors of many fish
+
+    Arguments:
+        rel_pos {np.array} -- Relative positions of shape (..., K, 2)
+        neighbors {np.array} -- Boolean mask of shape (..., K) of the
+            positions that belong to active neighbors
+        layers {tuple} -- Network weights, see `unpack_weights()`
+
+    Keyword Arguments:
+        fish_max_speed {number} -- Max speed of each fish (default: {9})
+
+    Returns:
+        np.array -- New velocity of shape (..., 2) of every fish
+    """
+    velocities = weight_neighbors(rel_pos, layers, fish_max_speed)
+
+    return np.sum(velocities * neighbors[..., np.newaxis], axis=-2)
+
+
 class ReplicaFish():
     """This class models each fish robot node in the network from the fish'
     perspective.
@@ -79,10 +177,12 @@ class ReplicaFish():
         # Both hidden and output layer have bias
         # activation function is the logistic sigmoid
 
-        self.input_to_hidden = np.reshape(weights[:6], (2, 3))
-        self.bias_hidden = np.reshape(weights[6:9], (1, 3))
-        self.hidden_to_output = np.reshape(weights[9:18], (3, 3))
-        self.bias_output = np.reshape(weights[18:21], (1, 3))
+        (
+            self.input_to_hidden,
+            self.bias_hidden,
+            self.hidden_to_output,
+            self.bias_output
+        ) = unpack_weights(weights)
 
 
     def start(self):
@@ -168,7 +268,7 @@ class ReplicaFish():
 
 
     def logistic_sigmoid(self, x):
-        return 1 / (1 + np.exp(-x))
+        return logistic_sigmoid(x)
 
     def weight_neighbor(self, rel_pos_to_neighbor):
         """Weight neighbors by the relative position to them
@@ -182,38 +282,41 @@ class ReplicaFish():
             np.array -- Velocity contribution of this neighbor to fish's
                 final new velocity
         """
-        #print(rel_pos_to_neighbor)
+        return self.weight_neighbors(np.reshape(rel_pos_to_neighbor, (1, 2)))[0]
+
+    def weight_neighbors(self, rel_pos_to_neighbors):
+        """Weight all neighbors at once by the relative position to them
 
+        Arguments:
+            rel_pos_to_neighbors {np.array} -- Relative positions of shape
+                (K, 2) to K neighbors
+
+        Returns:
+            np.array -- Velocity contributions of shape (K, 2) of the
+                neighbors to fish's final new velocity
+        """
         # It is extrememly unlikely that a fish may be exactly on top of another
         # but if that occurs, we pretend the other fish was simply very close
         # to avoid division by zero errors. Tracking neighbor spacing
         # allows us to verify the quality of the learned function
-        dist_neighbor = max(0.00001, np.linalg.norm(rel_pos_to_neighbor))
-        self.neighbor_spacing.append(np.abs(dist_neighbor))
+        dist_neighbors = np.maximum(
+            0.00001, vector_norm(rel_pos_to_neighbors)[:, 0]
+        )
+        self.neighbor_spacing.extend(dist_neighbors)
 
         # Neural Networks do best when inputs are normalized. The max
         # distance of a neighbor is the communication radius, set to 100
         # so we divide by that to get input values between -1 and 1
-        neighbor_normalized = rel_pos_to_neighbor / 100
-        hidden = np.dot(neighbor_normalized, self.input_to_hidden) + \
-                    self.bias_hidden
-        hidden = self.logistic_sigmoid(hidden)
-
-
-        # run output layer and appropriately scale
-        output = self.logistic_sigmoid(np.dot(hidden, self.hidden_to_output) + self.bias_output)
-        #print(output)
-        output = np.reshape(output, (3, ))
-        output += np.array([-0.5, -0.5, 0])
-        direction = output[:2]
-        direction_magnitude = np.linalg.norm(direction)
-        if direction_magnitude > 0:
-            # scale speed output by fish max speed
-            final_velocity_vector = (direction / direction_magnitude) * output[2] * self.fish_max_speed
-
-        else:
-            final_velocity_vector = output[0:2]
-        return np.reshape(final_velocity_vector, (2,))
+        return weight_neighbors(
+            rel_pos_to_neighbors,
+            (
+                self.input_to_hidden,
+                self.bias_hidden,
+                self.hidden_to_output,
+                self.bias_output
+            ),
+            self.fish_max_speed
+        )
 
 
     def move(self, neighbors, rel_pos):
@@ -237,11 +340,12 @@ class ReplicaFish():
 
         # We track neighbor spacing to evaluating model quality.
         self.neighbor_spacing = []
-        for neighbor in neighbors:
-            neighbor_vector = self.weight_neighbor(rel_pos[neighbor])
-            if self.verbose:
-                print("fish #{}, attract result = {}".format(self.id, attract))
-            new_velocity += neighbor_vector
+        if n > 0:
+            neighbor_vectors = self.weight_neighbors(
+                np.array([rel_pos[neighbor] for neighbor in neighbors])
+            )
+            for neighbor_vector in neighbor_vectors:
+                new_velocity += neighbor_vector
         if self.verbose:
             print("fish #{}, new velocity after neighbors {}".format(self.id, new_velocity))
         # Cap the length of the move
@@ -1,21 +1,22 @@
 import matplotlib
 import math
 import numpy as np
+import os
 import pickle
 import time
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
-from multiprocessing import Pool
 
 from interaction import Interaction
 from environment import Environment
 from DelightFish import Fish
 from channel import Channel
 from observer import Observer
-from discriminator import Classifier
+from discriminator import classify_all
 from fitness import Fitness
 from optimizer import Optimizer
 
-from turing_learning import test_simulation
+from batch_trials import run_trials
 from utils import generate_distortion, generate_fish, generate_replica_fish, generate_all_fish, run_simulation
 
 """ Use this file to run a semi-distributed algorithm for learning
@@ -24,147 +25,197 @@ fish behavior
 
 # Set up some decided constants that could be changed not in the context of learning
 conn_threshold = 100
-run_time = 15
+num_ticks = 13
 total_fish = 25
 k_ar = 0.003
 max_speed = 9
 arena_size = 300
 
+# The state of learning is saved to this file after every generation. If it
+# exists, learning resumes from it exactly where it stopped.
+checkpoint_file = "norm_test_dist5-radii-only-checkpoint.pkl"
+
 
 # To do Turing Learning, we need to run a full simulation, termed test
 # for both real and fake fish. The fake fish use the weights, The real
-# fish do not.
-def run_full_test(weights, real = False):
-    arena_center = arena_size / 2.0
-    initial_spread = 20
-    fish_pos = initial_spread * np.random.rand(total_fish, 2) + arena_center - initial_spread / 2.0
-    clock_freqs = 1
-    verbose = False
-
-    distortion = generate_distortion(type='none', n=arena_size)
-    environment = Environment(
-        node_pos=fish_pos,
-        distortion=distortion,
-        prob_type='binary',
-        noise_magnitude=0,
+# fish do not. All trials of a generation are run at once by
+# `batch_trials.run_trials()`.
+def run_tests(weights, seed, generation, part):
+    """Run the tests of one generation
+
+    The initial fish positions only depend on the seed, the generation, and
+    which part of the generation is simulated, so every test can be repeated
+    exactly, e.g., after resuming, and safely run in another thread.
+
+    Arguments:
+        weights {list} -- Weights of the replica fish of every trial, or None
+            for a trial with real fish
+        seed {int} -- Seed of the learning run
+        generation {int} -- Generation
+        part {int} -- 0 for the real fish and 1 for the replica fish
+
+    Returns:
+        np.array -- Data of all trials, see `batch_trials.run_trials()`
+    """
+    return run_trials(
+        weights,
+        num_fish=total_fish,
+        num_ticks=num_ticks,
         conn_thres=conn_threshold,
-        verbose=verbose
+        k_ar=k_ar,
+        fish_max_speed=max_speed,
+        arena_size=arena_size,
+        rng=np.random.default_rng([seed, generation, part])
     )
-    interaction = Interaction(environment, verbose=verbose)
-    channel = Channel(environment)
 
-    # Have all real or all fake
-    if real:
-        n_fish = total_fish
-        n_replica_fish = 0
+
+def save_checkpoint(filename, checkpoint):
+    """Save the state of learning
+
+    The file is replaced atomically, so a crash while saving leaves the
+    previous checkpoint intact.
+
+    Arguments:
+        filename {str} -- Name of the checkpoint file
+        checkpoint {dict} -- State of learning
+    """
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as output:
+        pickle.dump(checkpoint, output, pickle.HIGHEST_PROTOCOL)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(tmp_filename, filename)
+
+
+def load_checkpoint(filename):
+    """Load the state of learning
+
+    Arguments:
+        filename {str} -- Name of the checkpoint file
+
+    Returns:
+        dict -- State of learning or None if there is no checkpoint
+    """
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, "rb") as f:
+        return pickle.load(f)
+
+
+def learn(num_generations=200, pop_size=100, checkpoint_file=checkpoint_file):
+    """Learn fish behavior with Turing Learning
+
+    In every generation the optimizer proposes weights for the replica fish
+    and the classifiers, all trials are simulated, and the classifiers score
+    the models and vice versa. While a generation is scored, the real fish of
+    the next generation are already simulated in the background. After every
+    generation the optimizer, the NumPy random state, and all scores are
+    saved, so learning can resume exactly after a crash.
+
+    Keyword Arguments:
+        num_generations {int} -- Total number of generations (default: {200})
+        pop_size {int} -- Number of models and classifiers per generation
+            (default: {100})
+        checkpoint_file {str} -- Name of the checkpoint file. Learning
+            resumes from it if it exists.
+            (default: {"norm_test_dist5-radii-only-checkpoint.pkl"})
+
+    Returns:
+        Optimizer -- Optimizer with the learned weights
+    """
+    checkpoint = load_checkpoint(checkpoint_file)
+
+    if checkpoint is None:
+        # Before Learning, we initalize evolution parameters. These broadly are
+        # the number of generations to run the algorithm, the population size
+        # and the number of weights we want to learn, which is dependen on the
+        # network architecture for the fish and the classifier
+        opt = Optimizer()
+        opt.init_model(21, pop_size)
+        opt.init_classifier(48, pop_size)
+        seed = np.random.SeedSequence().entropy
+        start = 0
+        scores = []
     else:
-        n_fish = 0
-        n_replica_fish = total_fish
-
-    fish = generate_all_fish(
-        n_fish=n_fish,
-        n_replica_fish= n_replica_fish,
-        channel=channel,
-        interaction=interaction,
-        k_coh = 0,
-        k_ar = k_ar,
-        alpha = 40,
-        weights = weights,
-        lim_neighbors=[0, math.inf],
-        neighbor_weights=1.0,
-        fish_max_speeds=max_speed,
-        clock_freqs=clock_freqs,
-        verbose=verbose
-    )
-    channel.set_nodes(fish)
-
-    observer = Observer(fish=fish, environment=environment, channel=channel)
-    fish_matrix = test_simulation(fish=fish, observer=observer, run_time=run_time)
-    return fish_matrix
-
-
-# Before Learning, we initalize evolution parameters. These broadly are
-# the number of generations to run the algorithm, the population size
-# and the number of weights we want to learn, which is dependen on the
-# network architecture for the fish and the classifier
-opt = Optimizer()
-pop_size = 100
-num_generations = 200
-opt.init_model(21, pop_size)
-opt.init_classifier(48, pop_size)
-
-# We could also read in the optimizer's saved state and continue
-# learning from a previous trial
-
-# with open('norm_test_dist5-radii-.pkl', 'rb') as f:
-#     opt = pickle.load(f)
-
-# The pool packages provides an easy way to
-# quickly parallelize the funning of a function (here my simulations).
-# pool.map will map the function on the set number of processes. This
-# significantly increased the speed of learning. My computer could do
-# 16 processes, but at that point the speed up was not much more and
-# my other programs were slower. 8 processes also allows me to run
-# ~5 trials at once and still use my (slower then) computer
-pool = Pool(processes = 8)
-for i in range(num_generations):
-    print("Gen {}".format(i))
-    # In a generation, we get new weights, then run simulations and
-    # collect data regarding those fish
-    model_weights = opt.get_model_weights()
-    classifier_weights = opt.get_classifier_weights()
-    ideal_model = run_full_test(None, real = True)
-    start_time = time.time()
-    replica_models = pool.map(run_full_test, model_weights)
-    replica_models.insert(0, ideal_model)
-    end_time = time.time()
-    print("All trials took {} seconds".format(end_time - start_time))
-
-    # The distributed simulation framework means very occasionaly one trial
-    # will hit one more or fewer clock cycles and not have the right sized data.
-    # This mostly happens if my computer sleeps. In this case, we just try
-    # agin with the same weights, though it does cound as a generation.
-    try:
-        all_trials = np.stack(replica_models)
-    except ValueError:
-        print("error")
-        continue
-    start_time = time.time()
-
-    # We initialize and run the classifiers on all data collected. This
-    # could also be parallelized for a small performance improvement
-    total_classifiers = [Classifier(id = 1, weights = weights).classify_all_models(all_trials) for weights in classifier_weights]
-    fitness_scorer = Fitness(total_classifiers)
-    end_time = time.time()
-    print("scoring took {} seconds".format(end_time - start_time))
-    class_scores = fitness_scorer.score_classifiers()
-    model_scores = fitness_scorer.score_models()
-    print(class_scores)
-    print(model_scores)
-
-    # This tells the optimizer (the evolutinary algorithm) the fitness
-    # scores of all current agents and classifiers. The optimizer than
-    # updates the weights for the next use
-    opt.give_model_scores(model_scores)
-    opt.give_classifier_scores(class_scores)
-
-    # Saving state every ten trials allows us to go abck and look at
-    # learned behavior over the generations
-    if (i % 10 == 0):
-        filename = "norm_test_dist5-iter{}-radii-only.pkl".format(i)
-        with open(filename, "wb") as output:
-            pickle.dump(opt, output, pickle.HIGHEST_PROTOCOL)
-
-        # also save scores
-        filename = "norm_test_dist5-iter{}-scores-radii-only.pkl".format(i)
-        with open(filename, "wb") as output:
-            pickle.dump((class_scores, model_scores), output, pickle.HIGHEST_PROTOCOL)
-pool.close()
-pool.join()
-
-# save final weights and scores to file for evalution.
-with open("norm_test_dist5-radii-only-end.pkl", 'wb') as output:
-    pickle.dump(opt, output, pickle.HIGHEST_PROTOCOL)
-
-with open("norm_test_dist5_scores-radii-only-end.pkl", "wb") as output:
-    pickle.dump((class_scores, model_scores), output, pickle.HIGHEST_PROTOCOL)
+        opt = checkpoint["opt"]
+        seed = checkpoint["seed"]
+        start = checkpoint["generation"]
+        scores = checkpoint["scores"]
+        # The optimizer samples weights from NumPy's global random state
+        np.random.set_state(checkpoint["random_state"])
+        print("Resume at gen {}".format(start))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        if start < num_generations:
+            ideal_model = executor.submit(run_tests, [None], seed, start, 0)
+
+        for i in range(start, num_generations):
+            print("Gen {}".format(i))
+            # In a generation, we get new weights, then run simulations and
+            # collect data regarding those fish
+            model_weights = opt.get_model_weights()
+            classifier_weights = opt.get_classifier_weights()
+            start_time = time.time()
+            replica_models = run_tests(model_weights, seed, i, 1)
+            all_trials = np.concatenate((ideal_model.result(), replica_models))
+            end_time = time.time()
+            print("All trials took {} seconds".format(end_time - start_time))
+
+            # The real fish of the next generation do not depend on the
+            # scores, so they are simulated while this generation is scored
+            if i + 1 < num_generations:
+                ideal_model = executor.submit(run_tests, [None], seed, i + 1, 0)
+
+            start_time = time.time()
+
+            # We run all classifiers on all data collected at once
+            total_classifiers = classify_all(classifier_weights, all_trials)
+            fitness_scorer = Fitness(total_classifiers)
+            end_time = time.time()
+            print("scoring took {} seconds".format(end_time - start_time))
+            class_scores = fitness_scorer.score_classifiers()
+            model_scores = fitness_scorer.score_models()
+            print(class_scores)
+            print(model_scores)
+
+            # This tells the optimizer (the evolutinary algorithm) the fitness
+            # scores of all current agents and classifiers. The optimizer than
+            # updates the weights for the next use
+            opt.give_model_scores(model_scores)
+            opt.give_classifier_scores(class_scores)
+            scores.append((class_scores, model_scores))
+
+            save_checkpoint(checkpoint_file, {
+                "generation": i + 1,
+                "seed": seed,
+                "opt": opt,
+                "scores": scores,
+                "random_state": np.random.get_state()
+            })
+
+            # Saving state every ten trials allows us to go abck and look at
+            # learned behavior over the generations
+            if (i % 10 == 0):
+                filename = "norm_test_dist5-iter{}-radii-only.pkl".format(i)
+                with open(filename, "wb") as output:
+                    pickle.dump(opt, output, pickle.HIGHEST_PROTOCOL)
+
+                # also save scores
+                filename = "norm_test_dist5-iter{}-scores-radii-only.pkl".format(i)
+                with open(filename, "wb") as output:
+                    pickle.dump((class_scores, model_scores), output, pickle.HIGHEST_PROTOCOL)
+
+    # save final weights and scores to file for evalution.
+    with open("norm_test_dist5-radii-only-end.pkl", 'wb') as output:
+        pickle.dump(opt, output, pickle.HIGHEST_PROTOCOL)
+
+    if scores:
+        with open("norm_test_dist5_scores-radii-only-end.pkl", "wb") as output:
+            pickle.dump(scores[-1], output, pickle.HIGHEST_PROTOCOL)
+
+    return opt
+
+
+if __name__ == '__main__':
+    learn()
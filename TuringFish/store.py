@@ -0,0 +1,234 @@
+import json
+import os
+import numpy as np
+
+HEADER = 'header.json'
+VERSION = 2
+
+
+class TrajectoryStore():
+    """Append-only on-disk store of recorded time series
+
+    A store is a directory with a `header.json` describing the number of fish,
+    the ids of the recorded fish, the clock frequency, and the shape, data
+    type, and sampling interval of every field, plus one raw binary file per
+    field that holds one sample per recorded tick. Samples are
+    collected in chunks and appended to disk whenever a chunk is full, so a
+    run of any length only keeps one chunk per field in memory. Stored fields
+    are read back lazily as memory-mapped arrays.
+    """
+
+    def __init__(
+        self,
+        path,
+        num_nodes=0,
+        clock_freq=1,
+        chunk_size=256,
+        node_ids=None
+    ):
+        """Create a new store, replacing stored fields of the same name
+
+        Arguments:
+            path {str} -- Directory of the store
+
+        Keyword Arguments:
+            num_nodes {int} -- Number of fish (default: {0})
+            clock_freq {number} -- Clock frequency of the fish (default: {1})
+            chunk_size {int} -- Number of samples per field that are collected
+                before they are appended to disk (default: {256})
+            node_ids {list} -- Ids of the fish recorded in the per-fish
+                fields, in the order of their columns. All fish if None.
+                (default: {None})
+        """
+        self.path = path
+        self.num_nodes = num_nodes
+        self.node_ids = None if node_ids is None else [int(i) for i in node_ids]
+        self.clock_freq = clock_freq
+        self.chunk_size = max(1, chunk_size)
+        self.readonly = False
+        self.fields = {}
+        self.intervals = {}
+        self.chunks = {}
+        self.sizes = {}
+
+        os.makedirs(path, exist_ok=True)
+        self.write_header()
+
+    @classmethod
+    def open(cls, path):
+        """Open a store for reading
+
+        Arguments:
+            path {str} -- Directory of the store
+
+        Returns:
+            TrajectoryStore -- Read-only store
+        """
+        with open(os.path.join(path, HEADER)) as f:
+            header = json.load(f)
+
+        if header['version'] != VERSION:
+            raise ValueError(
+                'Unsupported store version {}'.format(header['version'])
+            )
+
+        store = cls.__new__(cls)
+        store.path = path
+        store.num_nodes = header['num_nodes']
+        store.node_ids = header['node_ids']
+        store.clock_freq = header['clock_freq']
+        store.chunk_size = 0
+        store.readonly = True
+        store.fields = {
+            name: (tuple(field['shape']), np.dtype(field['dtype']))
+            for name, field in header['fields'].items()
+        }
+        store.intervals = {
+            name: field['every']
+            for name, field in header['fields'].items()
+        }
+        store.chunks = {}
+        store.sizes = {}
+
+        return store
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def file(self, name):
+        """Path of the binary file of a field
+
+        Arguments:
+            name {str} -- Name of the field
+
+        Returns:
+            str -- Path
+        """
+        return os.path.join(self.path, name + '.bin')
+
+    def write_header(self):
+        """Write the description of the store to `header.json`
+        """
+        header = {
+            'version': VERSION,
+            'num_nodes': self.num_nodes,
+            'node_ids': self.node_ids,
+            'clock_freq': self.clock_freq,
+            'fields': {
+                name: {
+                    'shape': list(shape),
+                    'dtype': dtype.str,
+                    'every': self.intervals[name]
+                }
+                for name, (shape, dtype) in self.fields.items()
+            }
+        }
+
+        with open(os.path.join(self.path, HEADER), 'w') as f:
+            json.dump(header, f, indent=2)
+
+    def add(self, name, shape=(), dtype=float, every=1):
+        """Add a field
+
+        Arguments:
+            name {str} -- Name of the field
+
+        Keyword Arguments:
+            shape {tuple} -- Shape of one sample (default: {()})
+            dtype {type} -- Data type of the samples (default: {float})
+            every {int} -- Number of ticks between two samples (default: {1})
+        """
+        if self.readonly:
+            raise ValueError('Store is read-only')
+
+        self.fields[name] = (tuple(shape), np.dtype(dtype))
+        self.intervals[name] = int(every)
+        self.chunks[name] = np.zeros(
+            (self.chunk_size,) + tuple(shape), dtype=dtype
+        )
+        self.sizes[name] = 0
+
+        # Start a new series
+        open(self.file(name), 'wb').close()
+        self.write_header()
+
+    def append(self, name, sample):
+        """Store one sample of a field
+
+        Arguments:
+            name {str} -- Name of the field
+            sample {np.array} -- Sample of the shape of the field
+        """
+        self.chunks[name][self.sizes[name]] = sample
+        self.sizes[name] += 1
+
+        if self.sizes[name] == self.chunk_size:
+            self.flush(name)
+
+    def flush(self, name=None):
+        """Append all collected samples to disk
+
+        Keyword Arguments:
+            name {str} -- Only flush this field if not None (default: {None})
+        """
+        if self.readonly:
+            return
+
+        names = self.chunks if name is None else [name]
+
+        for name in names:
+            size = self.sizes[name]
+            if size == 0:
+                continue
+
+            with open(self.file(name), 'ab') as f:
+                f.write(self.chunks[name][:size].tobytes())
+
+            self.sizes[name] = 0
+
+    def size(self, name):
+        """Number of stored samples of a field, without unflushed ones
+
+        Arguments:
+            name {str} -- Name of the field
+
+        Returns:
+            int -- Number of samples
+        """
+        shape, dtype = self.fields[name]
+        itemsize = dtype.itemsize * int(np.prod(shape, dtype=int))
+        if itemsize == 0:
+            return 0
+
+        return os.path.getsize(self.file(name)) // itemsize
+
+    def get(self, name):
+        """All stored samples of a field, without unflushed ones
+
+        Arguments:
+            name {str} -- Name of the field
+
+        Returns:
+            np.array -- Read-only memory map of shape (T, ...)
+        """
+        shape, dtype = self.fields[name]
+        size = self.size(name)
+
+        if size == 0:
+            return np.zeros((0,) + shape, dtype=dtype)
+
+        # A partially written last sample, e.g., of a crashed run, is ignored
+        return np.memmap(
+            self.file(name), dtype=dtype, mode='r', shape=(size,) + shape
+        )
+
+    def ticks(self, name):
+        """Clock ticks of all stored samples of a field
+
+        Arguments:
+            name {str} -- Name of the field
+
+        Returns:
+            np.array -- Tick of every sample, counted from the first one
+        """
+        return np.arange(self.size(name)) * self.intervals[name]
@@ -1,6 +1,5 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import threading
 import math
 
 from channel import Channel
@@ -8,62 +7,49 @@ from environment import Environment
 from replica_fish import ReplicaFish
 from DelightFish import Fish
 from observer import Observer
-from utils import generate_distortion, generate_fish, generate_replica_fish, generate_all_fish, run_simulation
+from utils import generate_distortion, generate_fish, generate_replica_fish, generate_all_fish, run_simulation, step_simulation
 from interaction import Interaction
 from environment import Environment
 def test_simulation(
     fish,
     observer,
-    run_time=5,
+    num_ticks=5,
 ):
     """Run a simulation and format data from it for use by classifiers
 
+    The simulation runs in lock-step, see `utils.step_simulation()`, so the
+    data covers exactly `num_ticks` clock ticks independent of the load of
+    the machine. Fish only start to move in their third clock tick, so two
+    more ticks are simulated before.
 
     Arguments:
         fish {list} -- List of fish instances
         observer {Observer} -- Observer instance
 
     Keyword Arguments:
-        run_time {number} -- Total run time in seconds (default: {5})
+        num_ticks {int} -- Number of recorded clock ticks (default: {5})
 
     """
-    def stop():
-        for f in fish:
-            f.stop()
-        observer.stop()
+    for _ in range(num_ticks + 2):
+        step_simulation(fish, observer)
 
-
-    # Start the fish
-    fish_threads = []
-    for f in fish:
-        threading.Thread(target=f.start).start()
-
-
-    observer_thread = threading.Thread(target=observer.start)
-    observer_thread.start()
-
-    # Wait for the simulation to end, so data can be collected
-    # from the observer
-    fish_matrixes = []
-    threading.Timer(run_time, stop).start()
-    observer_thread.join()
+    observer.stop()
 
     # merge each fish's linear speed, angular speed, and neighbor
     # distances into a single matrix. This will
-    # utlimately be a N x (N + 1) matrix, where N is the number
+    # utlimately be a N x T x (N + 1) array, where N is the number
     # of fish.
-    for fish_index in range(observer.num_nodes):
-        single_fish = np.column_stack((observer.lin_speed[fish_index],
-            observer.ang_speed[fish_index],
-            observer.neighbor_distances[fish_index]))
-        fish_matrixes.append(single_fish)
-    return np.stack(fish_matrixes, axis = 0)
+    return np.concatenate((
+        observer.lin_speed[:, :, np.newaxis],
+        observer.ang_speed[:, :, np.newaxis],
+        observer.neighbor_distances
+    ), axis=2)
 
 
 
 def run_full_test(weights,
     conn_threshold,
-    run_time,
+    num_ticks,
     total_fish,
     k_ar,
     max_speed,
@@ -77,7 +63,7 @@ def run_full_test(weights,
     Arguments:
         weights {float|list} --- weights used by Neural Network in imposter fish
         conn_threshold {float} -- Distance at which fish can no longer detect other fish
-        run_time {int} -- Length of time to run simulation
+        num_ticks {int} -- Number of recorded clock ticks
         total_fish {int} -- Number of fish to be in the school
         k_ar {float} -- parameter for delight fish
         max_speed {float} -- Max speed of a single fish
@@ -128,7 +114,7 @@ def run_full_test(weights,
     channel.set_nodes(fish)
 
     observer = Observer(fish=fish, environment=environment, channel=channel)
-    fish_matrix = test_simulation(fish=fish, observer=observer, run_time=run_time)
+    fish_matrix = test_simulation(fish=fish, observer=observer, num_ticks=num_ticks)
     return fish_matrix
 
 
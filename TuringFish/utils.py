@@ -426,3 +426,67 @@ def run_simulation(
         observer_thread.join()
 
 
+def step_simulation(fish, observer):
+    """Advance all fish and the observer by exactly one clock tick.
+
+    Every fish first evaluates its queue and moves, then the observer records
+    the swarm and broadcasts due instructions, and finally every fish
+    communicates. This is the same order the threaded simulation aims for but
+    without any sleeping.
+
+    Arguments:
+        fish {list} -- List of fish instances
+        observer {Observer} -- Observer instance
+    """
+    for f in fish:
+        f.eval()
+
+    observer.eval()
+
+    for f in fish:
+        f.communicate()
+
+
+def run_lockstep_simulation(
+    fish,
+    observer,
+    num_ticks=10,
+    dark=False,
+    white_axis=False,
+    no_legend=False,
+    no_star=False,
+    show_dist_plot=False,
+    plot=True
+):
+    """Run the simulation synchronously for a fixed number of clock ticks.
+
+    Unlike `run_simulation()` no threads are started and nothing sleeps, so the
+    simulation runs as fast as the CPU allows and always covers exactly
+    `num_ticks` clock cycles.
+
+    Arguments:
+        fish {list} -- List of fish instances
+        observer {Observer} -- Observer instance
+
+    Keyword Arguments:
+        num_ticks {int} -- Total number of clock ticks (default: {10})
+        dark {bool} -- If `True` plot a dark chart (default: {False})
+        white_axis {bool} -- If `True` plot white axes (default: {False})
+        no_legend {bool} -- If `True` do not plot a legend (default: {False})
+        no_star {bool} -- If `True` do not plot a star (default: {False})
+        show_dist_plot {bool} -- If `True` plot the average neighbor distance
+            (default: {False})
+        plot {bool} -- If `True` plot the fish movement (default: {True})
+    """
+    for _ in range(num_ticks):
+        step_simulation(fish, observer)
+
+    observer.stop()
+    if plot:
+        observer.plot(
+            dark=dark,
+            white_axis=white_axis,
+            no_legend=no_legend,
+            no_star=no_star,
+            show_dist_plot=show_dist_plot
+        )